@@ -0,0 +1,193 @@
+"""
+iperf3 and tcpdump helpers shared by the capture scripts (cong.py, cong2.py,
+college.py, congestion.py, non_congestion.py): network construction, kernel
+buffer tuning, CPU pinning, launching and reaping background jobs in the
+Mininet hosts, the iperf3 server, and reading iperf3 -J reports.
+
+Mininet is imported inside the helpers that use it, so importing this module
+stays cheap for scripts that parse their arguments first.
+"""
+import os
+import re
+import subprocess
+import time
+from pathlib import Path
+from signal import SIGTERM
+try:
+    import orjson as _json      # faster, parses bytes directly
+except ImportError:
+    import json as _json
+
+IPERF_PORT = 5201              # iperf3 server control port
+IPERF_PIDFILE = '/tmp/iperf3.pid'  # written by the daemonized iperf3 server (-D -I)
+IPERF_TAIL_BYTES = 16384       # tail of each iperf3 JSON searched for the 'end' summary
+POLL_INTERVAL = 0.05           # seconds between readiness/exit checks
+# In-kernel BPF filter: keep only the iperf3 flows, drop ARP/IPv6 ND/LLDP noise
+CAPTURE_FILTER = 'tcp port 5201'
+# sysctls raised at start-up so socket buffers and the input backlog don't starve senders
+NET_SYSCTLS = {
+    'net/core/rmem_max': 67108864,
+    'net/core/wmem_max': 67108864,
+    'net/core/netdev_max_backlog': 250000,
+}
+
+# CPU pinning: core 0 runs the iperf3 server, core 1 tcpdump, and iperf3 clients
+# rotate over the remaining cores. Without at least three cores nothing is pinned.
+NCORES = len(os.sched_getaffinity(0))
+PIN_CPUS = NCORES > 2
+SERVER_CORE = 0
+CAPTURE_CORE = 1
+
+
+def iperf_affinity(core):
+    """iperf3 -A arguments pinning the process to core ([] when pinning is off)."""
+    return ['-A', str(core)] if PIN_CPUS else []
+
+
+def client_affinity(i):
+    """iperf3 -A arguments for the i-th client, cycling over the non-reserved cores."""
+    return iperf_affinity(2 + i % (NCORES - 2)) if PIN_CPUS else []
+
+
+def capture_affinity():
+    """taskset prefix pinning tcpdump to CAPTURE_CORE ([] when pinning is off)."""
+    return ['taskset', '-c', str(CAPTURE_CORE)] if PIN_CPUS else []
+
+
+def tune_kernel_buffers():
+    """Raise the socket-buffer caps and input backlog once, before any traffic starts."""
+    for key, value in NET_SYSCTLS.items():
+        Path('/proc/sys', key).write_text(f'{value}\n')
+
+
+def unbuilt_network(topo, controller=None):
+    """
+    A TCLink Mininet for topo, not yet built; add the controller, then net.start().
+
+    build=False so the controller is in place before the topology is built;
+    net.start() then builds it and brings every OVS bridge up in one batched
+    ovs-vsctl call.
+    """
+    from mininet.net import Mininet
+    from mininet.link import TCLink
+
+    return Mininet(topo=topo, controller=controller, link=TCLink, build=False, cleanup=True)
+
+
+def start_background(jobs):
+    """
+    Launch (host, cmd) jobs, each cmd ending in '&', without a round-trip per host.
+
+    All commands are written with sendCmd() first and only then is each host's
+    prompt reaped, so N hosts cost roughly one shell round-trip instead of N.
+    Hosts must be distinct within one call. Mininet records the PID of a
+    backgrounded command in host.lastPid; the PIDs are returned in job order.
+    """
+    for host, cmd in jobs:
+        host.sendCmd(cmd)
+    pids = []
+    for host, _ in jobs:
+        host.waitOutput()
+        pids.append(host.lastPid)
+    return pids
+
+
+def wait_for_listen(host, port=IPERF_PORT, timeout=5):
+    """Poll ss on host until a TCP socket listens on port (or timeout seconds pass)."""
+    from mininet.log import info
+
+    deadline = time.monotonic() + timeout
+    while not host.cmd(f"ss -Hltn 'sport = :{port}'").strip():
+        if time.monotonic() > deadline:
+            info(f'    ! nothing listening on {host.name}:{port} after {timeout}s\n')
+            return
+        time.sleep(POLL_INTERVAL)
+
+
+def pid_running(pid):
+    """True while pid exists and is not a zombie waiting to be reaped by its host shell."""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except FileNotFoundError:
+        return False
+
+
+def wait_for_exit(pids, timeout):
+    """Poll until every pid has exited or timeout seconds pass; returns the ones still running."""
+    deadline = time.monotonic() + timeout
+    pending = [pid for pid in pids if pid]
+    while pending and time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        pending = [pid for pid in pending if pid_running(pid)]
+    return pending
+
+
+def start_iperf_server(receiver, timeout=5):
+    """
+    Start a daemonized iperf3 server on receiver and return once it listens.
+
+    iperf3 -D detaches before it binds, so poll ss for the listen socket on
+    IPERF_PORT instead of sleeping a fixed second. The daemon's PID is in IPERF_PIDFILE.
+    """
+    receiver.cmd(' '.join(['iperf3', '-s', '-D', '-I', IPERF_PIDFILE, *iperf_affinity(SERVER_CORE)]))
+    wait_for_listen(receiver, IPERF_PORT, timeout)
+
+
+def stop_iperf_server():
+    """SIGTERM the daemon recorded in IPERF_PIDFILE (it removes the file on exit)."""
+    try:
+        os.kill(int(Path(IPERF_PIDFILE).read_text()), SIGTERM)
+    except (FileNotFoundError, ValueError, ProcessLookupError):
+        pass
+
+
+def stop_procs(procs, timeout=2):
+    """Terminate procs and reap them; one still running after timeout seconds is killed."""
+    for proc in procs:
+        proc.terminate()
+    for proc in procs:
+        try:
+            proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+
+# The top-level summary is the only '"end": {' in an iperf3 report; the
+# per-interval and per-stream "end" keys all hold numeric timestamps.
+_IPERF_END_RE = re.compile(rb'"end":\s*\{')
+
+
+def _end_from_tail(tail):
+    """The 'end' object decoded from a report's tail, or None if it is not all in there."""
+    m = _IPERF_END_RE.search(tail)
+    if m:
+        try:
+            return _json.loads(tail[m.end() - 1:tail.rindex(b'}')])
+        except ValueError:
+            pass
+    return None
+
+
+def read_iperf_end(report):
+    """
+    Return the top-level 'end' object of an iperf3 -J report (bytes).
+
+    'end' is the last key iperf3 writes, so the object runs from the match
+    to just before the report's closing brace. Only that slice of the last
+    IPERF_TAIL_BYTES is decoded. Falls back to a full parse when the
+    summary does not fit in that window.
+    """
+    end = _end_from_tail(report[-IPERF_TAIL_BYTES:])
+    return end if end is not None else _json.loads(report).get('end', {})
+
+
+def read_iperf_end_file(path):
+    """read_iperf_end() for a report on disk, reading only its last IPERF_TAIL_BYTES."""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - IPERF_TAIL_BYTES))
+        tail = f.read()
+    end = _end_from_tail(tail)
+    return end if end is not None else _json.loads(Path(path).read_bytes()).get('end', {})
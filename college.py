@@ -20,12 +20,13 @@ Usage:
 import os
 import sys
 import time
-from mininet.net import Mininet
+from mininet.topo import Topo
 from mininet.node import OVSController, RemoteController
 from mininet.cli import CLI
-from mininet.link import TCLink
 from mininet.log import setLogLevel, info
 
+from capture_common import tune_kernel_buffers, unbuilt_network
+
 # ------------------ Configuration ------------------
 EDGE_SWITCH_COUNT = 3          # number of edge switches (s1..sN)
 SENDERS_PER_EDGE = 4          # number of sender hosts per edge switch
@@ -33,7 +34,9 @@ SENDER_BW_MEG = 5             # each sender link bandwidth (Mbps)
 CORE_TO_RECEIVER_BW_MEG = 10  # bottleneck capacity to receiver (Mbps)
 LINK_DELAY = '2ms'
 TRAFFIC_DURATION = 20         # seconds for iperf3 client test
+STREAMS_PER_SENDER = 1        # iperf3 -P streams per sender (one process, one control connection)
 CAPTURE_DIR = '/tmp'          # where tcpdump pcap files are stored
+UDP_PAYLOAD_LEN = 1400        # iperf3 -l: one datagram per MTU-sized frame
 # ---------------------------------------------------
 
 def print_header(title):
@@ -41,18 +44,37 @@ def print_header(title):
     info(f'*** {title}\n')
     info('-'*70 + '\n')
 
-def create_large_congestion_network(controller_type):
+class LargeCongestionTopo(Topo):
     """
-    Create a multi-switch many-to-one topology:
+    Multi-switch many-to-one topology:
       - core switch: s0 (canonical name so Mininet can derive DPID)
       - edge switches: s1 .. sN
       - hosts: h1 .. hM (senders) attached to edge switches
       - receiver: hr attached to core switch (bottleneck)
     """
+
+    def build(self):
+        core = self.addSwitch('s0')
+        host_index = 1
+        for i in range(EDGE_SWITCH_COUNT):
+            sw = self.addSwitch(f's{i+1}')
+            # Links between core and edges are high capacity (no artificial limit)
+            self.addLink(sw, core, bw=1000, delay=LINK_DELAY)
+            for _ in range(SENDERS_PER_EDGE):
+                h = self.addHost(f'h{host_index}')
+                self.addLink(h, sw, bw=SENDER_BW_MEG, delay=LINK_DELAY)
+                host_index += 1
+        receiver = self.addHost('hr')
+        self.addLink(receiver, core, bw=CORE_TO_RECEIVER_BW_MEG, delay=LINK_DELAY)
+
+def create_large_congestion_network(controller_type):
+    """
+    Build LargeCongestionTopo under the given controller type and start it.
+    """
     # Clean Mininet state
     os.system('sudo mn -c >/dev/null 2>&1')
 
-    net = Mininet(controller=controller_type, link=TCLink, cleanup=True)
+    net = unbuilt_network(LargeCongestionTopo(), controller_type)
 
     print_header('Network Setup Phase')
 
@@ -62,41 +84,13 @@ def create_large_congestion_network(controller_type):
     else:
         net.addController('c0', controller=RemoteController, ip='127.0.0.1', port=6633)
 
-    info('--> Adding a core switch (s0) and edge switches (s1..)\n')
-    # Use canonical names: s0, s1, s2, ...
-    core = net.addSwitch('s0')  # canonical name so Mininet can derive a DPID
-    edge_switches = []
-    for i in range(EDGE_SWITCH_COUNT):
-        sw_name = f's{i+1}'
-        sw = net.addSwitch(sw_name)
-        edge_switches.append(sw)
-        info(f'    - Added edge switch {sw.name}\n')
-
-    info('--> Connecting edge switches to the core switch (high capacity links)\n')
-    for sw in edge_switches:
-        # Links between core and edges are high capacity (no artificial limit)
-        net.addLink(sw, core, bw=1000, delay=LINK_DELAY)
-        info(f'    - Link: {sw.name} <--> {core.name} (1 Gbps, {LINK_DELAY})\n')
-
-    info('--> Adding sender hosts on each edge switch\n')
-    senders = []
-    host_index = 1
-    for i, sw in enumerate(edge_switches):
-        for j in range(SENDERS_PER_EDGE):
-            h_name = f'h{host_index}'
-            h = net.addHost(h_name)
-            net.addLink(h, sw, bw=SENDER_BW_MEG, delay=LINK_DELAY)
-            senders.append(h)
-            info(f'    - Host: {h.name} connected to {sw.name} (~{SENDER_BW_MEG} Mbps)\n')
-            host_index += 1
-
-    info('--> Adding single receiver host attached to the core switch\n')
-    receiver = net.addHost('hr')
-    net.addLink(receiver, core, bw=CORE_TO_RECEIVER_BW_MEG, delay=LINK_DELAY)
-    info(f'    - Bottleneck Link: {receiver.name} <--> {core.name} ({CORE_TO_RECEIVER_BW_MEG} Mbps)\n')
+    info(f'--> Topology: core s0 + {EDGE_SWITCH_COUNT} edge switches (1 Gbps, {LINK_DELAY}), '
+         f'{EDGE_SWITCH_COUNT * SENDERS_PER_EDGE} senders (~{SENDER_BW_MEG} Mbps each), '
+         f'bottleneck hr <--> s0 ({CORE_TO_RECEIVER_BW_MEG} Mbps)\n')
 
     info('--> Starting network\n')
     net.start()
+    tune_kernel_buffers()
 
     # Stabilize
     info('--> Waiting for network components to stabilize...\n')
@@ -119,6 +113,7 @@ def run_traffic_test(net):
 
     # Start tcpdump on each host
     info('--> Starting tcpdump on all hosts (writing to /tmp/<host>.pcap)\n')
+    lines = []  # per-host log lines, emitted with one info() after the loop
     for host in net.hosts:
         # Use defaultIntf name
         intf = host.defaultIntf()
@@ -127,7 +122,8 @@ def run_traffic_test(net):
         # Use -U (unbuffered) so pcap grows during capture
         cmd = f'tcpdump -i {intf} -U -w {pcap} >/dev/null 2>&1 &'
         host.cmd(cmd)
-        info(f'    - tcpdump on {host.name} (intf {intf}) -> {pcap}\n')
+        lines.append(f'    - tcpdump on {host.name} (intf {intf}) -> {pcap}\n')
+    info(''.join(lines))
 
     # Stabilize tcpdump
     time.sleep(1)
@@ -143,10 +139,17 @@ def run_traffic_test(net):
     senders = [h for h in net.hosts if h.name != receiver.name]
 
     info(f'--> Launching iperf3 UDP clients from {len(senders)} senders to {receiver.name}\n')
+    # Same target and rate for every sender, so build them once
+    rx_ip = receiver.IP()
+    # -b applies per stream, so split the sender's rate across its streams
+    per_stream = f'{SENDER_BW_MEG / STREAMS_PER_SENDER:g}M'
+    lines = []
     for s in senders:
         # Each sender attempts to send at configured bandwidth
-        s.cmd(f'iperf3 -c {receiver.IP()} -u -b {SENDER_BW_MEG}M -t {TRAFFIC_DURATION} >/dev/null 2>&1 &')
-        info(f'    - {s.name} -> {receiver.name} : -u -b {SENDER_BW_MEG}M -t {TRAFFIC_DURATION}\n')
+        s.cmd(f'iperf3 -c {rx_ip} -u -P {STREAMS_PER_SENDER} -b {per_stream} '
+              f'-l {UDP_PAYLOAD_LEN} --udp-counters-64bit -t {TRAFFIC_DURATION} >/dev/null 2>&1 &')
+        lines.append(f'    - {s.name} -> {receiver.name} : -u -P {STREAMS_PER_SENDER} -b {per_stream} -t {TRAFFIC_DURATION}\n')
+    info(''.join(lines))
 
     info(f'\n*** Traffic running for {TRAFFIC_DURATION} seconds. Expect congestion at the bottleneck. ***\n')
 
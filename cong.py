@@ -6,37 +6,45 @@ This upgraded script includes everything from the previous version plus:
  - Automatic CSV summary of per-sender throughput & loss (/tmp/iperf_summary.csv)
  - Quick-demo mode (use --quick) to run a short test with fewer hosts and shorter duration
  - Optional Wireshark GUI auto-open (use --open-wireshark) if Wireshark is installed and an X display is available
- - Command-line flags: remote, --quick, --open-wireshark
+ - Command-line flags: remote, --quick, --open-wireshark, --runs
 
 Usage examples:
   sudo python3 cong_analysis.py                # full run (default)
   sudo python3 cong_analysis.py remote         # remote controller
   sudo python3 cong_analysis.py --quick        # quick demo (fewer hosts, shorter run)
   sudo python3 cong_analysis.py --open-wireshark --quick
+  sudo python3 cong_analysis.py --runs 5       # 5 back-to-back runs on one network
 
 Outputs:
-  - /tmp/*.pcap (pcap files)
-  - /tmp/iperf_*.json (iperf3 JSON files)
+  - /tmp/hr.pcap0..3 (receiver pcap ring buffer files)
+  - /tmp/iperf_cross_*.json (cross-traffic iperf3 JSON; per-sender reports are parsed in memory)
   - /tmp/tshark_summary_*.txt (tshark text summaries)
-  - /tmp/iperf_summary.csv (CSV of per-sender results: host, bits_per_second, Mbps, lost_percent)
+  - /tmp/iperf_summary.csv (CSV of per-sender results: host, bits_per_second, Mbps, lost_percent, status)
+    (/tmp/iperf_summary_run<N>.csv per run with --runs N)
 
 Requirements: mininet, iperf3, tcpdump, tshark, optional wireshark
 """
 
 import os
 import sys
+import csv
 import time
-import json
 import shutil
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from signal import SIGTERM
 from pathlib import Path
 from argparse import ArgumentParser
-from mininet.net import Mininet
+from mininet.clean import cleanup as mn_cleanup
+from mininet.topo import Topo
 from mininet.node import OVSController, RemoteController
 from mininet.cli import CLI
-from mininet.link import TCLink
 from mininet.log import setLogLevel, info
 
+from capture_common import (SERVER_CORE, capture_affinity, client_affinity, iperf_affinity,
+                            read_iperf_end, start_background, tune_kernel_buffers,
+                            unbuilt_network, wait_for_exit, wait_for_listen)
+
 # ------------------ Default Configuration ------------------
 EDGE_SWITCH_COUNT = 3          # number of edge switches (s1..sN)
 SENDERS_PER_EDGE = 4           # number of sender hosts per edge switch
@@ -44,11 +52,33 @@ SENDER_BW_MEG = 5              # each sender link bandwidth (Mbps)
 CORE_TO_RECEIVER_BW_MEG = 10   # bottleneck capacity to receiver (Mbps)
 LINK_DELAY = '2ms'
 TRAFFIC_DURATION = 20          # seconds for iperf3 client test
+STREAMS_PER_SENDER = 1         # iperf3 -P: parallel streams sharing one client process
 CAPTURE_DIR = Path('/tmp')     # where tcpdump pcap files are stored
 EXTRA_CROSS_TRAFFIC = True     # launch additional cross-traffic to increase congestion
 CROSS_TRAFFIC_RATE_M = 2       # Mbps per cross-traffic flow
+CONNECT_TIMEOUT = 10           # seconds to wait for the switches to reach the controller
+CAPTURE_STOP_TIMEOUT = 5       # seconds a SIGTERMed tcpdump gets to flush its last block
+CSV_BUFFER_BYTES = 1 << 20     # CSV file buffer: one write() even for thousands of rows
+CAPTURE_SNAPLEN = 96           # bytes kept per packet: Ethernet + IP + UDP headers
+CAPTURE_BUFFER_KIB = 8192      # tcpdump -B kernel capture buffer, absorbs bursts
+CAPTURE_FILE_MB = 50           # tcpdump -C: rotate to the next ring file after this many MB
+CAPTURE_RING_FILES = 4         # tcpdump -W: ring of <host>.pcap0..3, oldest overwritten
+CAPTURE_GLOB = 'hr.pcap*'      # the receiver's ring files, the only pcaps this script writes
+CAPTURE_FILTER = 'udp'         # BPF filter, applied in-kernel before the copy to tcpdump
+UDP_PAYLOAD_LEN = 1400         # iperf3 -l: one datagram per 1500-byte MTU frame
 # -----------------------------------------------------------
 
+# Resolved once at import; None for tools that are not on PATH
+TOOLS = {tool: shutil.which(tool) for tool in ('iperf3', 'tcpdump', 'tshark', 'wireshark')}
+
+# PIDs of the iperf3 jobs we launched; cleanup_background_processes() kills them
+BACKGROUND_PIDS = []
+# tcpdump PIDs, kept apart so cleanup can wait for them to finish writing the ring
+CAPTURE_PIDS = []
+# Popen handles of the iperf3 clients; stopped through the handle (never by
+# a bare PID, which may be reused once the child has been reaped)
+BACKGROUND_PROCS = []
+
 
 def print_header(title):
     info('\n' + '-' * 70 + '\n')
@@ -58,18 +88,33 @@ def print_header(title):
 
 def check_tools():
     """Ensure required CLI tools are available and warn if not."""
-    missing = []
-    for tool in ('iperf3', 'tcpdump', 'tshark'):
-        if shutil.which(tool) is None:
-            missing.append(tool)
+    missing = [tool for tool in ('iperf3', 'tcpdump', 'tshark') if TOOLS[tool] is None]
     if missing:
         info(f"WARNING: Required tools missing: {', '.join(missing)}\n")
         info('Please install them (e.g. `sudo apt install iperf3 tcpdump tshark`) and re-run.\n')
 
 
+class CongestionTopo(Topo):
+    """Edge switches s1..sN uplinked to core s0, senders on the edges, receiver hr on the core."""
+
+    def build(self, edge_count=EDGE_SWITCH_COUNT, senders_per_edge=SENDERS_PER_EDGE):
+        core = self.addSwitch('s0')
+        host_idx = 1
+        for i in range(edge_count):
+            sw = self.addSwitch(f's{i + 1}')
+            self.addLink(sw, core, bw=1000, delay=LINK_DELAY)
+            for _ in range(senders_per_edge):
+                h = self.addHost(f'h{host_idx}')
+                self.addLink(h, sw, bw=SENDER_BW_MEG, delay=LINK_DELAY)
+                host_idx += 1
+        receiver = self.addHost('hr')
+        self.addLink(receiver, core, bw=CORE_TO_RECEIVER_BW_MEG, delay=LINK_DELAY)
+
+
 def create_congestion_network(controller_type, edge_count, senders_per_edge):
-    os.system('sudo mn -c >/dev/null 2>&1')
-    net = Mininet(controller=controller_type, link=TCLink, cleanup=True)
+    mn_cleanup()
+    net = unbuilt_network(CongestionTopo(edge_count=edge_count, senders_per_edge=senders_per_edge),
+                          controller_type)
 
     print_header('Network Setup Phase')
 
@@ -79,105 +124,163 @@ def create_congestion_network(controller_type, edge_count, senders_per_edge):
     else:
         net.addController('c0', controller=RemoteController, ip='127.0.0.1', port=6633)
 
-    info('--> Adding core switch (s0) and edge switches (s1..sN)\n')
-    core = net.addSwitch('s0')
-    edge_switches = []
-    for i in range(edge_count):
-        sw = net.addSwitch(f's{i + 1}')
-        edge_switches.append(sw)
-        info(f'    - Added edge switch {sw.name}\n')
-
-    info('--> Connecting edge switches to core (high capacity)\n')
-    for sw in edge_switches:
-        net.addLink(sw, core, bw=1000, delay=LINK_DELAY)
-        info(f'    - Link: {sw.name} <--> {core.name} (1 Gbps)\n')
-
-    info('--> Adding senders to edge switches\n')
-    senders = []
-    host_idx = 1
-    for i, sw in enumerate(edge_switches):
-        for j in range(senders_per_edge):
-            h = net.addHost(f'h{host_idx}')
-            net.addLink(h, sw, bw=SENDER_BW_MEG, delay=LINK_DELAY)
-            senders.append(h)
-            info(f'    - Host: {h.name} -> {sw.name} (~{SENDER_BW_MEG} Mbps)\n')
-            host_idx += 1
-
-    info('--> Adding receiver host attached to core (bottleneck)\n')
-    receiver = net.addHost('hr')
-    net.addLink(receiver, core, bw=CORE_TO_RECEIVER_BW_MEG, delay=LINK_DELAY)
-    info(f'    - Bottleneck: {receiver.name} <--> {core.name} ({CORE_TO_RECEIVER_BW_MEG} Mbps)\n')
+    info(f'--> Topology: core s0 + {edge_count} edge switches (1 Gbps uplinks), '
+         f'{edge_count * senders_per_edge} senders (~{SENDER_BW_MEG} Mbps each), '
+         f'bottleneck hr <--> s0 ({CORE_TO_RECEIVER_BW_MEG} Mbps)\n')
 
     info('--> Starting network\n')
     net.start()
-    time.sleep(2)
+    tune_kernel_buffers()
+    if not net.waitConnected(timeout=CONNECT_TIMEOUT):
+        info(f'! switches not connected to controller after {CONNECT_TIMEOUT}s; continuing\n')
     return net
 
 
 def launch_tcpdump_on_hosts(net):
     CAPTURE_DIR.mkdir(parents=True, exist_ok=True)
-    info('--> Starting tcpdump on each host (pcap -> /tmp/<host>.pcap)\n')
-    for h in net.hosts:
-        intf = h.defaultIntf()
-        pcap = CAPTURE_DIR / f'{h.name}.pcap'
-        cmd = f'tcpdump -i {intf} -U -n -w {pcap} >/dev/null 2>&1 &'
-        h.cmd(cmd)
-        info(f'    - tcpdump: {h.name} (intf {intf}) -> {pcap}\n')
-    time.sleep(1)
+    # drop our captures from earlier runs so only this run's files get analyzed;
+    # other pcaps in CAPTURE_DIR (other scripts', the user's) are left alone
+    for old in CAPTURE_DIR.glob(CAPTURE_GLOB):
+        old.unlink()
+    # Every main flow converges on hr, so one capture there sees all of them;
+    # per-sender captures would only record the same packets again.
+    receiver = net.get('hr')
+    intf = receiver.defaultIntf()
+    pcap = CAPTURE_DIR / 'hr.pcap'
+    info(f'--> Starting tcpdump on hr (intf {intf}) -> {pcap}N ring\n')
+    cmd = ' '.join([*capture_affinity(), 'tcpdump', '-i', str(intf), '-s', str(CAPTURE_SNAPLEN),
+                    '-B', str(CAPTURE_BUFFER_KIB), '-n', '-C', str(CAPTURE_FILE_MB),
+                    '-W', str(CAPTURE_RING_FILES), '-w', str(pcap),
+                    f"'{CAPTURE_FILTER}'", '>/dev/null 2>&1 &'])
+    return start_background([(receiver, cmd)])
 
 
 def start_iperf_server(receiver):
     info(f"--> Starting iperf3 server on {receiver.name} ({receiver.IP()})\n")
-    receiver.cmd('iperf3 -s >/dev/null 2>&1 &')
-    time.sleep(1)
+    receiver.cmd(' '.join(['iperf3', '-s', *iperf_affinity(SERVER_CORE), '>/dev/null 2>&1 &']))
+    wait_for_listen(receiver)
+    return [receiver.lastPid]
 
 
 def launch_iperf_clients(senders, receiver, duration, bw_mbps):
-    info('--> Launching iperf3 UDP clients (JSON output to /tmp/iperf_<host>.json)\n')
-    for s in senders:
-        out = CAPTURE_DIR / f'iperf_{s.name}.json'
-        cmd = f'iperf3 -c {receiver.IP()} -u -b {bw_mbps}M -t {duration} -J > {out} 2>&1 &'
-        s.cmd(cmd)
-        info(f'    - {s.name} -> {receiver.name} : {bw_mbps}M (output: {out})\n')
+    """Start one iperf3 client per sender; returns [(host name, Popen)] with -J on stdout."""
+    info('--> Launching iperf3 UDP clients (JSON reports read back over pipes)\n')
+    rx_ip = receiver.IP()
+    # -b is per stream, so split the sender's rate across its -P streams
+    per_stream = f'{bw_mbps / STREAMS_PER_SENDER:g}M'
+    clients, lines = [], []
+    for i, s in enumerate(senders):
+        cmd = ['iperf3', '-c', rx_ip, *client_affinity(i), '-u',
+               '-P', str(STREAMS_PER_SENDER), '-b', per_stream,
+               '-l', str(UDP_PAYLOAD_LEN), '--udp-counters-64bit', '-t', str(duration), '-J']
+        clients.append((s.name, s.popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)))
+        lines.append(f'    - {s.name} -> {receiver.name} : {bw_mbps}M\n')
+    info(''.join(lines))
+    return clients
 
 
 def launch_cross_traffic(net, duration, rate_mbps):
     if not EXTRA_CROSS_TRAFFIC:
-        return
+        return []
     info('--> Launching extra cross-traffic flows between pairs (UDP)\n')
     senders = [h for h in net.hosts if h.name.startswith('h')]
+    jobs, lines = [], []
     for i in range(0, len(senders), 2):
         src = senders[i]
         dst = senders[(i + 1) % len(senders)]
         out = CAPTURE_DIR / f'iperf_cross_{src.name}_to_{dst.name}.json'
-        cmd = f'iperf3 -c {dst.IP()} -u -b {rate_mbps}M -t {duration} -J > {out} 2>&1 &'
-        src.cmd(cmd)
-        info(f'    - cross {src.name} -> {dst.name} : {rate_mbps}M (output: {out})\n')
-
-
-def wait_for_traffic_completion(duration):
-    info(f'--> Waiting for traffic to complete ({duration}s + margin)...\n')
-    time.sleep(duration + 3)
+        cmd = (' '.join(['iperf3', '-c', dst.IP(), *client_affinity(i)]) +
+               f' -u -b {rate_mbps}M -l {UDP_PAYLOAD_LEN} --udp-counters-64bit -t {duration} -J > {out} 2>&1 &')
+        jobs.append((src, cmd))
+        lines.append(f'    - cross {src.name} -> {dst.name} : {rate_mbps}M (output: {out})\n')
+    info(''.join(lines))
+    return start_background(jobs)
+
+
+def wait_for_traffic_completion(clients, other_pids, duration):
+    """
+    Wait (duration + 3 s at most) for the iperf3 clients and return
+    {host name: (JSON report bytes, status)}.
+
+    communicate() drains each client's pipe while waiting, so a large -J
+    report never blocks on a full pipe. status is 'ok', 'early-exit' for a
+    client that exited non-zero (iperf3 error), or 'timeout' for one still
+    running at the deadline, which is then killed. other_pids (cross
+    traffic) are polled against the same deadline.
+    """
+    info(f'--> Waiting for traffic to complete (up to {duration}s + margin)...\n')
+    deadline = time.monotonic() + duration + 3
+    reports = {}
+    for name, proc in clients:
+        try:
+            out, _ = proc.communicate(timeout=max(0, deadline - time.monotonic()))
+            status = 'ok' if proc.returncode == 0 else 'early-exit'
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            out, _ = proc.communicate()
+            status = 'timeout'
+        if status != 'ok':
+            info(f'    ! {name}: iperf3 client {status} (exit code {proc.returncode})\n')
+        reports[name] = (out, status)
+    wait_for_exit(other_pids, deadline - time.monotonic())
+    return reports
 
 
 def cleanup_background_processes():
-    info('--> Killing iperf3 and tcpdump background processes (best effort)\n')
-    os.system('killall iperf3 tcpdump >/dev/null 2>&1 || true')
+    info('--> Stopping the iperf3 and tcpdump processes we started\n')
+    # Mininet hosts share the root PID namespace, so the PIDs recorded in the
+    # host shells can be signalled directly, even after net.stop(). A recorded
+    # PID is None when Mininet didn't parse the '&' job marker; skip those.
+    while BACKGROUND_PIDS:
+        pid = BACKGROUND_PIDS.pop()
+        if not pid:
+            continue
+        try:
+            os.kill(pid, SIGTERM)
+        except ProcessLookupError:
+            pass
+    # Clients are normally reaped already by wait_for_traffic_completion();
+    # only ones still running (an error cut the wait short) get a SIGTERM
+    while BACKGROUND_PROCS:
+        proc = BACKGROUND_PROCS.pop()
+        if proc.poll() is None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+    # tcpdump writes its last buffered block on SIGTERM; the ring is only
+    # complete (and safe to analyze) once the process has actually exited
+    captures = []
+    while CAPTURE_PIDS:
+        pid = CAPTURE_PIDS.pop()
+        if not pid:
+            continue
+        try:
+            os.kill(pid, SIGTERM)
+            captures.append(pid)
+        except ProcessLookupError:
+            pass
+    if wait_for_exit(captures, CAPTURE_STOP_TIMEOUT):
+        info(f'    ! tcpdump still running after {CAPTURE_STOP_TIMEOUT}s; pcaps may be truncated\n')
 
 
-def analyze_iperf_jsons_and_write_csv(csv_path):
-    info('\n*** iperf3 JSON summaries (per-client) ***\n')
+def analyze_iperf_jsons_and_write_csv(reports, csv_path):
+    # per-client lines are collected and logged in one info() call
+    lines = ['\n*** iperf3 JSON summaries (per-client) ***\n']
     rows = []
-    for j in sorted(CAPTURE_DIR.glob('iperf_h*.json')):
+    for name, (report, status) in reports.items():
         try:
-            data = json.loads(j.read_text())
+            end = read_iperf_end(report)
         except Exception as e:
-            info(f'    - Failed to parse {j.name}: {e}\n')
-            continue
-        end = data.get('end', {})
+            lines.append(f'    - Failed to parse report from {name}: {e}\n')
+            end = {}
         sum_stats = end.get('sum') or end.get('sum_received') or end.get('sum_sent')
         if sum_stats is None:
-            info(f'    - {j.name}: no sum stats found in JSON\n')
+            # keep a row so failed clients still show up in the CSV with their status
+            lines.append(f'    - {name}: no sum stats found in JSON ({status})\n')
+            rows.append((name, None, None, None, status))
             continue
         bps = sum_stats.get('bits_per_second', 0)
         lost = None
@@ -189,45 +292,80 @@ def analyze_iperf_jsons_and_write_csv(csv_path):
             except Exception:
                 lost = None
         mbps = float(bps) / 1e6 if bps else 0.0
-        rows.append((j.stem.replace('iperf_', ''), bps, mbps, lost))
-        info(f'    - {j.name}: {mbps:.3f} Mbps, loss%={lost}\n')
+        rows.append((name, bps, mbps, lost, status))
+        lines.append(f'    - {name}: {mbps:.3f} Mbps, loss%={lost} ({status})\n')
+    info(''.join(lines))
 
     try:
-        with open(csv_path, 'w') as fo:
-            fo.write('host,bits_per_second,mbps,lost_percent\n')
-            for r in rows:
-                fo.write(f'{r[0]},{r[1]},{r[2]},{r[3]}\n')
+        with open(csv_path, 'w', newline='', buffering=CSV_BUFFER_BYTES) as fo:
+            w = csv.writer(fo)
+            w.writerow(('host', 'bits_per_second', 'mbps', 'lost_percent', 'status'))
+            w.writerows(rows)
         info(f'--> Wrote CSV summary to {csv_path}\n')
     except Exception as e:
         info(f'--> Failed to write CSV {csv_path}: {e}\n')
     return rows
 
 
+# Title line each -z tap prints under its opening '====' rule
+TSHARK_TAP_TITLES = {'conv': 'UDP Conversations', 'io': 'IO Statistics'}
+# Upper-layer dissectors neither tap reads; the taps only need IP/UDP
+TSHARK_DISABLED_PROTOCOLS = ('http', 'tls', 'dns', 'quic')
+
+
+def split_tshark_taps(text):
+    """
+    Split the stdout of one multi-tap tshark run into {tap key: report}.
+
+    Every -z report opens with a '====' rule directly above its title line,
+    so reports are cut at those rules regardless of the order tshark printed
+    them in.
+    """
+    starts = []
+    for key, title in TSHARK_TAP_TITLES.items():
+        idx = text.find(title)
+        if idx != -1:
+            title_line = text.rfind('\n', 0, idx) + 1
+            starts.append((text.rfind('\n', 0, max(title_line - 1, 0)) + 1, key))
+    starts.sort()
+    ends = [pos for pos, _ in starts[1:]] + [len(text)]
+    return {key: text[pos:end].strip('\n') for (pos, key), end in zip(starts, ends)}
+
+
+def analyze_one_pcap(pcap):
+    """Run both tshark taps over one pcap in a single pass and write its summary file."""
+    # hr.pcap0 -> tshark_summary_hr_0.txt, one summary per ring file
+    out = CAPTURE_DIR / f"tshark_summary_{pcap.name.replace('.pcap', '_')}.txt"
+    cmd = [TOOLS['tshark'], '-n', '-r', str(pcap), '-q', '-z', 'conv,udp', '-z', 'io,stat,1']
+    for proto in TSHARK_DISABLED_PROTOCOLS:
+        cmd += ['--disable-protocol', proto]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=20)
+    except subprocess.TimeoutExpired:
+        return f'    - {pcap.name}: tshark timed out while analyzing pcap.\n'
+    taps = split_tshark_taps(result.stdout)
+    with open(out, 'w') as fo:
+        fo.write('=== conv,udp ===\n')
+        fo.write(taps.get('conv', '') + '\n')
+        fo.write('=== io,stat,1 (I/O per 1s interval) ===\n')
+        fo.write(taps.get('io', '') + '\n')
+    return f'    - {pcap.name}: wrote tshark analysis to {out}\n'
+
+
 def run_tshark_analysis_for_pcaps():
     info('\n*** tshark analysis (pcap -> summaries) ***\n')
-    for pcap in sorted(CAPTURE_DIR.glob('*.pcap')):
-        out = CAPTURE_DIR / f'tshark_summary_{pcap.stem}.txt'
-        info(f'    - Analyzing {pcap} -> {out}\n')
-        try:
-            conv_udp = subprocess.run(['tshark', '-r', str(pcap), '-q', '-z', 'conv,udp'],
-                                      capture_output=True, text=True, timeout=20)
-            io_stat = subprocess.run(['tshark', '-r', str(pcap), '-q', '-z', 'io,stat,1'],
-                                     capture_output=True, text=True, timeout=20)
-            with open(out, 'w') as fo:
-                fo.write('=== conv,udp ===\n')
-                fo.write(conv_udp.stdout + '\n')
-                fo.write('=== io,stat,1 (I/O per 1s interval) ===\n')
-                fo.write(io_stat.stdout + '\n')
-            info(f'        - Wrote tshark analysis to {out}\n')
-        except FileNotFoundError:
-            info('        - tshark not installed; skipping.\n')
-            break
-        except subprocess.TimeoutExpired:
-            info('        - tshark timed out while analyzing pcap.\n')
+    if TOOLS['tshark'] is None:
+        info('        - tshark not installed; skipping.\n')
+        return
+    pcaps = sorted(CAPTURE_DIR.glob(CAPTURE_GLOB))
+    # tshark is single-threaded and the pcaps are independent, so run one per
+    # core; the work happens in the tshark children, so threads are enough.
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as ex:
+        info(''.join(ex.map(analyze_one_pcap, pcaps)))
 
 
 def maybe_open_wireshark(pcap_to_open):
-    if shutil.which('wireshark') is None:
+    if TOOLS['wireshark'] is None:
         info('--> wireshark not found in PATH; skipping GUI open.\n')
         return
     if os.environ.get('DISPLAY') is None:
@@ -235,31 +373,33 @@ def maybe_open_wireshark(pcap_to_open):
         return
     try:
         info(f'--> Launching Wireshark on {pcap_to_open} (GUI)...\n')
-        subprocess.Popen(['wireshark', str(pcap_to_open)])
+        subprocess.Popen([TOOLS['wireshark'], str(pcap_to_open)])
     except Exception as e:
         info(f'--> Failed to launch Wireshark: {e}\n')
 
 
-def run_traffic_and_analysis(net, duration, bw_mbps, open_wireshark):
+def run_traffic_and_analysis(net, duration, bw_mbps, open_wireshark, csv_name='iperf_summary.csv'):
     try:
         check_tools()
-        launch_tcpdump_on_hosts(net)
+        CAPTURE_PIDS.extend(launch_tcpdump_on_hosts(net))
         receiver = net.get('hr')
-        start_iperf_server(receiver)
+        BACKGROUND_PIDS.extend(start_iperf_server(receiver))
 
         senders = [h for h in net.hosts if h.name.startswith('h')]
-        launch_iperf_clients(senders, receiver, duration, bw_mbps)
-        launch_cross_traffic(net, duration, CROSS_TRAFFIC_RATE_M)
+        clients = launch_iperf_clients(senders, receiver, duration, bw_mbps)
+        BACKGROUND_PROCS.extend(proc for _, proc in clients)
+        cross_pids = launch_cross_traffic(net, duration, CROSS_TRAFFIC_RATE_M)
+        BACKGROUND_PIDS.extend(cross_pids)
 
-        wait_for_traffic_completion(duration)
+        reports = wait_for_traffic_completion(clients, cross_pids, duration)
         cleanup_background_processes()
 
-        csv_path = CAPTURE_DIR / 'iperf_summary.csv'
-        analyze_iperf_jsons_and_write_csv(csv_path)
+        csv_path = CAPTURE_DIR / csv_name
+        analyze_iperf_jsons_and_write_csv(reports, csv_path)
         run_tshark_analysis_for_pcaps()
 
         if open_wireshark:
-            maybe_open_wireshark(CAPTURE_DIR / 'hr.pcap')
+            maybe_open_wireshark(min(CAPTURE_DIR.glob(CAPTURE_GLOB), default=CAPTURE_DIR / 'hr.pcap0'))
 
         info('\n*** Analysis complete. Pcap, iperf JSON, and CSV in /tmp. ***\n')
 
@@ -278,6 +418,9 @@ def main():
                         help='Run a quick demo with fewer hosts & shorter duration')
     parser.add_argument('--open-wireshark', action='store_true',
                         help='Open Wireshark GUI on receiver pcap after run')
+    parser.add_argument('--runs', type=int, default=1,
+                        help='Repeat the traffic test N times on one network '
+                             '(CSV per run; pcaps/tshark summaries are from the last run)')
     args = parser.parse_args()
 
     controller = OVSController
@@ -301,7 +444,16 @@ def main():
 
     net = create_congestion_network(controller, edge_count, senders_per_edge)
     try:
-        run_traffic_and_analysis(net, duration, bw_mbps, args.open_wireshark)
+        # The network is built once; each run only restarts tcpdump/iperf3,
+        # which run_traffic_and_analysis() always stops again before returning.
+        for run in range(1, args.runs + 1):
+            if args.runs > 1:
+                print_header(f'Run {run}/{args.runs}')
+                csv_name = f'iperf_summary_run{run}.csv'
+            else:
+                csv_name = 'iperf_summary.csv'
+            last = run == args.runs
+            run_traffic_and_analysis(net, duration, bw_mbps, args.open_wireshark and last, csv_name)
 
         info('\n' + '-' * 70 + '\n')
         info('*** Finished automated traffic+analysis run. Dropping to Mininet CLI. ***\n')
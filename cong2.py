@@ -5,15 +5,20 @@ High sender bandwidth > bottleneck to receiver to force packet loss.
 """
 
 import os
-import time
-import json
+import csv
+from multiprocessing import Pool
+from signal import SIGTERM
 from pathlib import Path
-from mininet.net import Mininet
+from mininet.clean import cleanup as mn_cleanup
+from mininet.topo import Topo
 from mininet.node import OVSController, RemoteController
 from mininet.cli import CLI
-from mininet.link import TCLink
 from mininet.log import setLogLevel, info
 
+from capture_common import (SERVER_CORE, capture_affinity, client_affinity, iperf_affinity,
+                            read_iperf_end_file, start_background, tune_kernel_buffers,
+                            unbuilt_network, wait_for_exit, wait_for_listen)
+
 CAPTURE_DIR = Path('/tmp')
 
 # Network config
@@ -23,151 +28,199 @@ SENDER_BW_MEG = 20      # Very high to force congestion
 CORE_TO_RECEIVER_BW_MEG = 10  # Bottleneck lower than total sender bw
 LINK_DELAY = '2ms'
 TRAFFIC_DURATION = 15
+STREAMS_PER_SENDER = 1  # iperf3 -P streams per sender process (end.sum aggregates them)
 EXTRA_CROSS_TRAFFIC = True
 CROSS_TRAFFIC_RATE_M = 5    # extra traffic to increase congestion
+CONNECT_TIMEOUT = 10        # seconds to wait for the switches to reach the controller
+CAPTURE_STOP_TIMEOUT = 5    # seconds a SIGTERMed tcpdump gets to flush its last block
+CSV_BUFFER_BYTES = 1 << 20  # whole CSV flushed in one write()
+PARALLEL_PARSE_MIN = 64     # parse reports in a process pool from this many senders up
+CAPTURE_SNAPLEN = 96        # keep Ethernet + IP + UDP headers only
+CAPTURE_BUFFER_KIB = 8192   # tcpdump -B kernel buffer
+CAPTURE_FILE_MB = 50        # tcpdump -C/-W: ring of CAPTURE_RING_FILES files per host
+CAPTURE_RING_FILES = 4
+CAPTURE_GLOB = 'hr.pcap*'   # hr's ring files; the only pcaps this script writes
+CAPTURE_FILTER = 'udp'      # in-kernel BPF filter
+UDP_PAYLOAD_LEN = 1400      # iperf3 -l, fits one MTU frame
+
+# PIDs of every iperf3 we backgrounded, killed by stop_processes()
+BACKGROUND_PIDS = []
+# tcpdump PIDs; stop_processes() also waits for these to exit
+CAPTURE_PIDS = []
+
+class CongestionTopo(Topo):
+    """Edge switches s1..sN on core s0, SENDERS_PER_EDGE senders each, receiver hr on s0."""
+
+    def build(self):
+        core = self.addSwitch('s0')
+        host_idx = 1
+        for i in range(EDGE_SWITCH_COUNT):
+            sw = self.addSwitch(f's{i+1}')
+            self.addLink(sw, core, bw=1000, delay=LINK_DELAY)  # fast links to core
+            for _ in range(SENDERS_PER_EDGE):
+                h = self.addHost(f'h{host_idx}')
+                self.addLink(h, sw, bw=SENDER_BW_MEG, delay=LINK_DELAY)
+                host_idx += 1
+        receiver = self.addHost('hr')
+        self.addLink(receiver, core, bw=CORE_TO_RECEIVER_BW_MEG, delay=LINK_DELAY)
 
 def create_network():
-    os.system('sudo mn -c >/dev/null 2>&1')
+    mn_cleanup()
     
-    # Connects to your external Ryu controller
-    net = Mininet(controller=None, link=TCLink, cleanup=True)
+    # Connects to your external Ryu controller.
+    net = unbuilt_network(CongestionTopo())
     net.addController('c0',
                       controller=RemoteController,
                       ip='127.0.0.1',
                       port=6653)
 
-    info('*** Adding core and edge switches\n')
-    core = net.addSwitch('s0')
-    edge_switches = []
-    for i in range(EDGE_SWITCH_COUNT):
-        sw = net.addSwitch(f's{i+1}')
-        edge_switches.append(sw)
-        net.addLink(sw, core, bw=1000, delay=LINK_DELAY)  # fast links to core
-
-    info('*** Adding senders\n')
-    senders = []
-    host_idx = 1
-    for sw in edge_switches:
-        for _ in range(SENDERS_PER_EDGE):
-            h = net.addHost(f'h{host_idx}')
-            net.addLink(h, sw, bw=SENDER_BW_MEG, delay=LINK_DELAY)
-            senders.append(h)
-            host_idx += 1
-
-    info('*** Adding receiver (bottleneck)\n')
-    receiver = net.addHost('hr')
-    net.addLink(receiver, core, bw=CORE_TO_RECEIVER_BW_MEG, delay=LINK_DELAY)
+    info(f'*** Topology: s0 + {EDGE_SWITCH_COUNT} edge switches, '
+         f'{EDGE_SWITCH_COUNT * SENDERS_PER_EDGE} senders, receiver hr (bottleneck)\n')
 
     info('*** Starting network\n')
     net.start()
-    time.sleep(2)
+    tune_kernel_buffers()
+    if not net.waitConnected(timeout=CONNECT_TIMEOUT):
+        info(f'! switches not connected to controller after {CONNECT_TIMEOUT}s; continuing\n')
+    receiver = net.get('hr')
+    senders = [h for h in net.hosts if h is not receiver]
     return net, senders, receiver
 
 def start_tcpdump(net):
     CAPTURE_DIR.mkdir(exist_ok=True)
-    for h in net.hosts:
-        intf = h.defaultIntf()
-        pcap = CAPTURE_DIR / f'{h.name}.pcap'
-        h.cmd(f'tcpdump -i {intf} -U -n -w {pcap} >/dev/null 2>&1 &')
-        info(f'    - tcpdump on {h.name} -> {pcap}\n')
-    time.sleep(1)
+    for old in CAPTURE_DIR.glob(CAPTURE_GLOB):  # leave other scripts' and the user's pcaps alone
+        old.unlink()
+    # all main traffic converges on hr, so capturing there alone is enough
+    receiver = net.get('hr')
+    intf = receiver.defaultIntf()
+    pcap = CAPTURE_DIR / 'hr.pcap'
+    info(f'    - tcpdump on hr -> {pcap}\n')
+    cmd = ' '.join([*capture_affinity(), 'tcpdump', '-i', str(intf), '-s', str(CAPTURE_SNAPLEN),
+                    '-B', str(CAPTURE_BUFFER_KIB), '-n', '-C', str(CAPTURE_FILE_MB),
+                    '-W', str(CAPTURE_RING_FILES), '-w', str(pcap),
+                    f"'{CAPTURE_FILTER}'", '>/dev/null 2>&1 &'])
+    return start_background([(receiver, cmd)])
 
 def start_iperf(net, senders, receiver):
     info('*** Starting main iperf traffic (senders -> receiver)\n')
-    receiver.cmd('iperf3 -s >/dev/null 2>&1 &')
-    time.sleep(1)
-    for s in senders:
+    receiver.cmd(' '.join(['iperf3', '-s', *iperf_affinity(SERVER_CORE), '>/dev/null 2>&1 &']))
+    pids = [receiver.lastPid]
+    wait_for_listen(receiver)
+    rx_ip = receiver.IP()
+    per_stream = f'{SENDER_BW_MEG / STREAMS_PER_SENDER:g}M'
+    jobs, lines = [], []
+    for i, s in enumerate(senders):
         out = CAPTURE_DIR / f'iperf_{s.name}.json'
-        s.cmd(f'iperf3 -c {receiver.IP()} -u -b {SENDER_BW_MEG}M -t {TRAFFIC_DURATION} -J > {out} 2>&1 &')
-        info(f'    - {s.name} -> {receiver.name} : {SENDER_BW_MEG}M\n')
+        jobs.append((s, ' '.join(['iperf3', '-c', rx_ip, *client_affinity(i)]) +
+                        f' -u -P {STREAMS_PER_SENDER} -b {per_stream} -l {UDP_PAYLOAD_LEN} --udp-counters-64bit '
+                        f'-t {TRAFFIC_DURATION} -J > {out} 2>&1 &'))
+        lines.append(f'    - {s.name} -> {receiver.name} : {SENDER_BW_MEG}M\n')
+    info(''.join(lines))
+    return pids + start_background(jobs)
 
 def launch_extra_traffic(net):
     if not EXTRA_CROSS_TRAFFIC:
-        return
+        return []
     
     info('*** Launching extra cross-traffic\n')
     # FIX: Exclude 'hr' from the list of hosts used for cross-traffic
     hosts = [h for h in net.hosts if h.name.startswith('h') and h.name != 'hr']
-    
-    destinations = []
+    pairs = [(hosts[i], hosts[i+1]) for i in range(0, len(hosts) - 1, 2)]
     
     # Start iperf servers on destination hosts first
-    for i in range(0, len(hosts), 2):
-        if (i+1) < len(hosts):
-            dst = hosts[(i+1)]
-            destinations.append(dst)
-            # FIX: Start an iperf server on the destination host
-            dst.cmd('iperf3 -s >/dev/null 2>&1 &')
-            
-    time.sleep(1) # Give servers time to start
+    # FIX: Start an iperf server on the destination host
+    # -1: each server exits after its one client instead of lingering until stop_processes()
+    server = ' '.join(['iperf3', '-s', '-1', *iperf_affinity(SERVER_CORE), '>/dev/null 2>&1 &'])
+    pids = start_background([(dst, server) for _, dst in pairs])
+    for _, dst in pairs:
+        wait_for_listen(dst)
 
     # Now start clients
-    for i in range(0, len(hosts), 2):
-        if (i+1) < len(hosts):
-            src = hosts[i]
-            dst = hosts[(i+1)]
-            out = CAPTURE_DIR / f'iperf_cross_{src.name}_to_{dst.name}.json'
-            src.cmd(f'iperf3 -c {dst.IP()} -u -b {CROSS_TRAFFIC_RATE_M}M -t {TRAFFIC_DURATION} -J > {out} 2>&1 &')
-            info(f'    - extra {src.name} -> {dst.name} : {CROSS_TRAFFIC_RATE_M}M\n')
+    jobs, lines = [], []
+    for i, (src, dst) in enumerate(pairs):
+        out = CAPTURE_DIR / f'iperf_cross_{src.name}_to_{dst.name}.json'
+        jobs.append((src, ' '.join(['iperf3', '-c', dst.IP(), *client_affinity(i)]) +
+                          f' -u -b {CROSS_TRAFFIC_RATE_M}M -l {UDP_PAYLOAD_LEN} --udp-counters-64bit -t {TRAFFIC_DURATION} -J > {out} 2>&1 &'))
+        lines.append(f'    - extra {src.name} -> {dst.name} : {CROSS_TRAFFIC_RATE_M}M\n')
+    info(''.join(lines))
+    return pids + start_background(jobs)
 
 def stop_processes():
-    os.system('killall iperf3 tcpdump >/dev/null 2>&1 || true')
+    # Hosts share the root PID namespace, so signal the recorded PIDs directly;
+    # lastPid is None when the '&' job marker wasn't parsed, so skip those
+    while BACKGROUND_PIDS:
+        pid = BACKGROUND_PIDS.pop()
+        if not pid:
+            continue
+        try:
+            os.kill(pid, SIGTERM)
+        except ProcessLookupError:
+            pass
+    # tcpdump flushes its last buffered block on SIGTERM; wait until it has
+    # exited so nothing reads a half-written pcap
+    captures = []
+    while CAPTURE_PIDS:
+        pid = CAPTURE_PIDS.pop()
+        if not pid:
+            continue
+        try:
+            os.kill(pid, SIGTERM)
+            captures.append(pid)
+        except ProcessLookupError:
+            pass
+    if wait_for_exit(captures, CAPTURE_STOP_TIMEOUT):
+        info(f'    ! tcpdump still running after {CAPTURE_STOP_TIMEOUT}s; pcaps may be truncated\n')
+
+def parse_report(j):
+    """(host, bps, mbps, lost) for one sender's report, or None if it has no UDP summary."""
+    try:
+        end = read_iperf_end_file(j)
+    except:
+        return None
+    # Use 'sum' for UDP results
+    sum_stats = end.get('sum')
+    if sum_stats is None:
+        return None
+
+    bps = sum_stats.get('bits_per_second', 0)
+    lost = sum_stats.get('lost_percent', 0)
+    mbps = bps / 1e6
+    return (j.stem.replace('iperf_', ''), bps, mbps, lost)
 
 def analyze_results():
     csv_path = CAPTURE_DIR / 'iperf_summary.csv'
-    rows = []
-    
+
     # FIX: Use a glob pattern that *only* matches sender hosts (h1, h2, etc.)
     # This prevents old 'iperf_hr.json' files from being included.
-    for j in CAPTURE_DIR.glob('iperf_h[0-9]*.json'):
-        try:
-            data = json.loads(j.read_text())
-        except:
-            continue
-        end = data.get('end', {})
-        # Use 'sum' for UDP results
-        sum_stats = end.get('sum')
-        if sum_stats is None:
-            continue
-            
-        bps = sum_stats.get('bits_per_second', 0)
-        lost = sum_stats.get('lost_percent', 0)
-        mbps = bps / 1e6
-        rows.append((j.stem.replace('iperf_', ''), bps, mbps, lost))
-        
-    # Sort rows by host name (h1, h2, ... h10, h11, h12)
-    rows.sort(key=lambda x: int(x[0].replace('h', '')))
+    reports = list(CAPTURE_DIR.glob('iperf_h[0-9]*.json'))
+    # Forking workers only pays off once there are many reports to decode
+    if len(reports) >= PARALLEL_PARSE_MIN:
+        with Pool() as pool:
+            parsed = pool.map(parse_report, reports)
+    else:
+        parsed = map(parse_report, reports)
+    rows = [r for r in parsed if r is not None]
+
+    # Sort rows by host name (h1, h2, ... h10, h11, h12); names are 'h<N>'
+    rows.sort(key=lambda r: int(r[0][1:]))
 
     # write CSV
-    with open(csv_path, 'w') as f:
-        f.write('host,bits_per_second,mbps,lost_percent\n')
-        for r in rows:
-            f.write(f'{r[0]},{r[1]},{r[2]},{r[3]}\n')
-
-    # Print the results to the console
-    info('*** iPerf Congestion Results (Senders -> Receiver) ***\n')
-    print(f"{'Host':<10} | {'Throughput (Mbps)':<20} | {'Packet Loss (%)':<18}")
-    print("-" * 52)
-
-    total_mbps = 0
-    total_lost_percent = 0
-    sender_count = 0
-
-    for r in rows:
-        # r[0] = host, r[1] = bps, r[2] = mbps, r[3] = lost
-        host = r[0]
-        mbps = r[2]
-        lost = r[3]
-        print(f"{host:<10} | {mbps:<20.2f} | {lost:<18.2f}")
-        total_mbps += mbps
-        total_lost_percent += lost
-        sender_count += 1
-        
-    if sender_count > 0:
-        avg_loss = total_lost_percent / sender_count
-        print("-" * 52)
-        print(f"{'TOTAL':<10} | {total_mbps:<20.2f} |")
-        print(f"{'AVG LOSS':<10} | {'':<20} | {avg_loss:<18.2f}")
+    with open(csv_path, 'w', newline='', buffering=CSV_BUFFER_BYTES) as f:
+        w = csv.writer(f)
+        w.writerow(('host', 'bits_per_second', 'mbps', 'lost_percent'))
+        w.writerows(rows)
+
+    # Build the results table and emit it with a single info() call
+    # r = (host, bps, mbps, lost)
+    lines = [f"{'Host':<10} | {'Throughput (Mbps)':<20} | {'Packet Loss (%)':<18}", "-" * 52]
+    lines += [f"{host:<10} | {mbps:<20.2f} | {lost:<18.2f}" for host, _, mbps, lost in rows]
+    if rows:
+        total_mbps = sum(r[2] for r in rows)
+        avg_loss = sum(r[3] for r in rows) / len(rows)
+        lines.append("-" * 52)
+        lines.append(f"{'TOTAL':<10} | {total_mbps:<20.2f} |")
+        lines.append(f"{'AVG LOSS':<10} | {'':<20} | {avg_loss:<18.2f}")
+    info('*** iPerf Congestion Results (Senders -> Receiver) ***\n' + '\n'.join(lines) + '\n')
     
     info(f'\n*** CSV summary written to {csv_path}\n')
 
@@ -176,11 +229,13 @@ def main():
     setLogLevel('info')
     net, senders, receiver = create_network()
     try:
-        start_tcpdump(net)
-        start_iperf(net, senders, receiver)
-        launch_extra_traffic(net)
-        info(f'*** Waiting {TRAFFIC_DURATION+3}s for traffic to finish\n')
-        time.sleep(TRAFFIC_DURATION + 3)
+        CAPTURE_PIDS.extend(start_tcpdump(net))
+        iperf_pids = start_iperf(net, senders, receiver)
+        extra_pids = launch_extra_traffic(net)
+        BACKGROUND_PIDS.extend(iperf_pids + extra_pids)
+        info(f'*** Waiting up to {TRAFFIC_DURATION+3}s for traffic to finish\n')
+        # iperf_pids[0] is the long-lived main server; the -1 cross servers exit with their clients
+        wait_for_exit(iperf_pids[1:] + extra_pids, TRAFFIC_DURATION + 3)
         stop_processes()
         analyze_results() # This will now print the results
         CLI(net)
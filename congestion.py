@@ -3,25 +3,36 @@
 congestion.py: A Mininet script to create a network with 4 senders and 1 receiver,
 specifically designed to create a many-to-one congestion scenario for analysis.
 This enhanced version includes formatted output and stabilizing delays.
+
+Usage: sudo python3 -O congestion.py [--controller {ovs,remote}] [remote]
+Mininet is imported inside the functions that use it, after argument
+parsing, so -h is instant and the functions still work when imported.
 """
-from mininet.net import Mininet
-from mininet.node import Controller, OVSController, RemoteController
-from mininet.cli import CLI
-from mininet.link import TCLink
-from mininet.log import setLogLevel, info
+import argparse
 import time
-import os
-import sys
+from pathlib import Path
+from subprocess import DEVNULL
+
+from capture_common import (CAPTURE_FILTER, capture_affinity, client_affinity, start_iperf_server,
+                            stop_iperf_server, stop_procs)
+
 
 def print_header(title):
     """Prints a formatted header to the console."""
+    from mininet.log import info
     info('\n' + '-'*60 + '\n')
     info(f'*** {title}\n')
     info('-'*60 + '\n')
 
 def create_congestion_network(controller_type):
     """Create and configure the network topology."""
-    os.system('sudo mn -c >/dev/null 2>&1')
+    from mininet.clean import cleanup as mn_cleanup
+    from mininet.net import Mininet
+    from mininet.node import OVSController, RemoteController
+    from mininet.link import TCLink
+    from mininet.log import info
+
+    mn_cleanup()
     net = Mininet(controller=controller_type, link=TCLink, cleanup=True)
 
     print_header("Network Setup Phase")
@@ -63,56 +74,84 @@ def create_congestion_network(controller_type):
 
 def run_traffic_test(net):
     """Run the iperf3 traffic test and capture packets."""
-    os.system('rm -f /tmp/*.pcap')
+    from mininet.log import info
+
+    for old in Path('/tmp').glob('*.pcap'):
+        old.unlink()
     
     print_header("Traffic Simulation & Data Capture Phase")
 
-    info('--> Starting packet capture (tcpdump) on all hosts\n')
-    for host in net.hosts:
-        host.cmd(f'tcpdump -w /tmp/{host.name}.pcap -i {host.intf()} &')
+    # Every process we start is tracked here and terminated at the end
+    procs = []
+
+    # All four flows converge on the s1 <-> h5 bottleneck, so one capture on
+    # the switch side of that link sees everything the per-host captures did.
+    # -s 96 keeps only the L2-L4 headers; -B 16384 is a 16 MiB kernel buffer;
+    # CAPTURE_FILTER drops non-iperf3 packets before they are copied to tcpdump.
+    s1, receiver = net.get('s1', 'h5')
+    bottleneck_intf = s1.connectionsTo(receiver)[0][0]
+    info(f'--> Starting packet capture (tcpdump) on bottleneck {bottleneck_intf}\n')
+    procs.append(s1.popen([*capture_affinity(), 'tcpdump', '-i', str(bottleneck_intf), '-w', '/tmp/bottleneck.pcap',
+                           '-s', '96', '-B', '16384', '--immediate-mode', CAPTURE_FILTER],
+                          stdout=DEVNULL, stderr=DEVNULL))
 
     # --- STABILIZING DELAY ---
     # Wait a moment for tcpdump to initialize properly.
     time.sleep(1)
 
-    receiver = net.get('h5')
-    info(f'--> Starting iperf3 server on receiver {receiver.name} ({receiver.IP()})\n')
+    rx_ip = receiver.IP()  # looked up once, reused by every client below
+    info(f'--> Starting iperf3 server on receiver {receiver.name} ({rx_ip})\n')
     # The iperf3 server can handle both TCP and UDP traffic by default.
-    receiver.cmd('iperf3 -s &')
-    
-    # --- STABILIZING DELAY ---
-    # Wait a moment for the iperf3 server to start listening. This is critical.
-    time.sleep(1)
+    # start_iperf_server() returns only once the server is listening.
+    start_iperf_server(receiver)
 
     senders = [net.get(f'h{i+1}') for i in range(4)]
     
-    info(f'--> Starting iperf3 clients from h1-h4 to {receiver.name} using UDP\n')
-    for sender in senders:
-        # The '-u' flag specifies UDP.
-        # The '-b 5M' flag tells the client to send at a constant 5 Mbps rate.
-        sender.cmd(f'iperf3 -c {receiver.IP()} -u -b 5M -t 20 &')
-
-    info('\n*** Traffic is now running for 20 seconds. FORCING CONGESTION WITH UDP. ***\n')
+    info(f'--> Starting iperf3 clients from h1-h4 to {receiver.name} using TCP\n')
+    # TCP backs off at the 10 Mbps bottleneck, so the capture shows the four
+    # flows competing for it instead of unpaced UDP loss.
+    # '-w 256K' sets the socket window far above the path BDP (~5 KB), so the
+    # window never limits a sender before the bottleneck does.
+    # Each client is pinned to its own core, away from the server's.
+    client_procs = [sender.popen(['iperf3', '-c', rx_ip, '-t', '20', '-w', '256K', *client_affinity(i)],
+                                 stdout=DEVNULL, stderr=DEVNULL)
+                    for i, sender in enumerate(senders)]
+
+    info('\n*** Traffic is now running for 20 seconds. TCP flows competing for the bottleneck. ***\n')
     
     # --- CRITICAL FIX: Wait for the traffic test to complete ---
-    # The iperf3 clients are running in the background for 20 seconds.
-    # We must pause the script here to allow them to finish.
-    time.sleep(21)  # Wait for 21 seconds (to be safe)
+    # Each client exits when its 20 second test is done, so wait on the
+    # processes themselves rather than sleeping a fixed time.
+    for proc in client_procs:
+        proc.wait()
 
-    info('--> Test finished. Killing background processes.\n')
-    os.system('killall iperf3 tcpdump >/dev/null 2>&1')
-    info('--> Data capture complete. Check /tmp/*.pcap files for analysis.\n')
+    info('--> Test finished. Stopping tcpdump and the iperf3 server.\n')
+    stop_iperf_server()
+    stop_procs(procs)
+    info('--> Data capture complete. Check /tmp/bottleneck.pcap for analysis.\n')
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Many-to-one congestion scenario with a bottleneck capture.')
+    parser.add_argument('--controller', choices=('ovs', 'remote'), default='ovs',
+                        help="'remote' uses a Ryu controller on 127.0.0.1:6633 (default: ovs)")
+    # The original bare spelling: sudo python3 congestion.py remote
+    parser.add_argument('mode', nargs='?', choices=('remote',),
+                        help='same as --controller=remote')
+    args = parser.parse_args()
+
+    # Deferred until after parsing: loading the Mininet stack is the slow part of startup
+    from mininet.node import OVSController, RemoteController
+    from mininet.cli import CLI
+    from mininet.log import setLogLevel, info
+
     setLogLevel('info')
     
     # Default to the built-in controller for standalone tests
     controller = OVSController
 
-    # Check command-line arguments to see if a remote controller is specified
-    if any('remote' in arg for arg in sys.argv):
-        info('*** Detected --controller=remote flag. Setting up for Ryu.\n')
+    if 'remote' in (args.controller, args.mode):
+        info('*** Detected remote controller flag. Setting up for Ryu.\n')
         controller = RemoteController
     else:
         info('*** No remote controller specified. Using default OVS Controller.\n')
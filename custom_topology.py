@@ -11,6 +11,8 @@ Host h1 is the traffic source.
 Host h2 is the traffic destination.
 The DRL agent will learn to route traffic from s1 via s2 (Path A) or s3 (Path B).
 """
+from collections import defaultdict
+from shlex import quote
 from mininet.topo import Topo
 from mininet.net import Mininet
 from mininet.node import OVSKernelSwitch, Controller, RemoteController
@@ -58,40 +60,35 @@ def runNet():
     # -----------------------------------------------------------------
     # --- STATIC FLOW RULES FOR ALL SWITCHES ---
     # -----------------------------------------------------------------
-    s1, s2, s3, s4 = net.get('s1', 's2', 's3', 's4')
-    h1, h2 = net.get('h1', 'h2')
-    h1_ip, h2_ip = h1.IP(), h2.IP()
+    # (switch, in_port, destination host, out_port): each row becomes a
+    # priority=10 IPv4 rule matching nw_dst. Rows are grouped per switch and
+    # each group is installed with a single `ovs-ofctl add-flows <sw> -` call.
+    ip_of = {h.name: h.IP() for h in net.get('h1', 'h2')}
+    flow_table = (
+        # --- s1 (The AI-controlled switch): RETURN traffic (h2 -> h1) only ---
+        ('s1', 2, 'h1', 1),  # from Path A (in_port=2) out to h1
+        ('s1', 3, 'h1', 1),  # from Path B (in_port=3) out to h1
+        # --- s2 (Path A) ---
+        ('s2', 1, 'h2', 2),  # h1->h2 traffic (from s1) out to s4
+        ('s2', 2, 'h1', 1),  # h2->h1 return traffic (from s4) out to s1
+        # --- s3 (Path B) ---
+        ('s3', 1, 'h2', 2),  # h1->h2 traffic (from s1) out to s4
+        ('s3', 2, 'h1', 1),  # h2->h1 return traffic (from s4) out to s1
+        # --- s4 (The join point) ---
+        ('s4', 2, 'h2', 1),  # h1->h2 traffic from Path A (s2) out to h2
+        ('s4', 3, 'h2', 1),  # h1->h2 traffic from Path B (s3) out to h2
+        ('s4', 1, 'h1', 2),  # h2->h1 return traffic: Path A (s4:p2) is the default return path
+    )
+    flows = defaultdict(list)
+    for sw, in_port, dst, out_port in flow_table:
+        flows[sw].append(f'priority=10,in_port={in_port},eth_type=0x0800,'
+                         f'nw_dst={ip_of[dst]},actions=output:{out_port}')
 
     print("--- Adding static flow rules to s1, s2, s3, and s4 ---")
-
-    # --- s1 (The AI-controlled switch) ---
-    # Add rules for the RETURN traffic (h2 -> h1)
-    # s1: Forward h2->h1 return traffic (from Path A, in_port=2) out to h1 (output:1)
-    s1.cmd(f'ovs-ofctl add-flow {s1.name} priority=10,in_port=2,eth_type=0x0800,nw_dst={h1_ip},actions=output:1')
-    # s1: Forward h2->h1 return traffic (from Path B, in_port=3) out to h1 (output:1)
-    s1.cmd(f'ovs-ofctl add-flow {s1.name} priority=10,in_port=3,eth_type=0x0800,nw_dst={h1_ip},actions=output:1')
-
-    # --- s2 (Path A) ---
-    # Forward h1->h2 traffic (from s1:p1) out to s4:p2
-    s2.cmd(f'ovs-ofctl add-flow {s2.name} priority=10,in_port=1,eth_type=0x0800,nw_dst={h2_ip},actions=output:2')
-    # Forward h2->h1 return traffic (from s4:p2) out to s1:p1
-    s2.cmd(f'ovs-ofctl add-flow {s2.name} priority=10,in_port=2,eth_type=0x0800,nw_dst={h1_ip},actions=output:1')
-
-    # --- s3 (Path B) ---
-    # Forward h1->h2 traffic (from s1:p1) out to s4:p2
-    s3.cmd(f'ovs-ofctl add-flow {s3.name} priority=10,in_port=1,eth_type=0x0800,nw_dst={h2_ip},actions=output:2')
-    # Forward h2->h1 return traffic (from s4:p2) out to s1:p1
-    s3.cmd(f'ovs-ofctl add-flow {s3.name} priority=10,in_port=2,eth_type=0x0800,nw_dst={h1_ip},actions=output:1')
-
-    # --- s4 (The join point) ---
-    # Forward h1->h2 traffic from Path A (from s2:p2) out to h2:p1
-    s4.cmd(f'ovs-ofctl add-flow {s4.name} priority=10,in_port=2,eth_type=0x0800,nw_dst={h2_ip},actions=output:1')
-    # Forward h1->h2 traffic from Path B (from s3:p3) out to h2:p1
-    s4.cmd(f'ovs-ofctl add-flow {s4.name} priority=10,in_port=3,eth_type=0x0800,nw_dst={h2_ip},actions=output:1')
-    
-    # Forward h2->h1 return traffic (from h2:p1) to Path A (s2:p2)
-    # We will make Path A (s4:p2) the default return path
-    s4.cmd(f'ovs-ofctl add-flow {s4.name} priority=10,in_port=1,eth_type=0x0800,nw_dst={h1_ip},actions=output:2')
+    for name, specs in flows.items():
+        sw = net.get(name)
+        # printf emits one spec per line on stdin; add-flows reads them all at once
+        sw.cmd(f"printf '%s\\n' {' '.join(map(quote, specs))} | ovs-ofctl add-flows {name} -")
     # -----------------------------------------------------------------
     # --- END OF NEW CODE BLOCK ---
     # -----------------------------------------------------------------
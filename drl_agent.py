@@ -2,18 +2,25 @@
 """
 AI-Driven TE Agent using Classic Q-Learning (No TensorFlow) - FINAL + DASHBOARD
 
-This agent uses a simple Q-Table (a dictionary) to learn the best path.
+This agent uses a simple Q-Table (a 9x2 array, one row per state) to learn the best path.
 
 - STATE: A tuple representing traffic levels (e.g., 'low', 'high')
 - ACTION: 0 (reroute via s2) or 1 (reroute via s3).
 - REWARD: Negative of the max traffic (to minimize congestion).
 """
+import argparse
 import requests
+from requests.adapters import HTTPAdapter
 import time
 import random
+import struct
+from bisect import bisect_right
 import numpy as np
 import json
-from collections import defaultdict
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # --- Agent Configuration ---
 ACTION_SIZE = 2     # Action 0: use Path A (port 2), Action 1: use Path B (port 3)
@@ -30,6 +37,32 @@ PORT_A = 2          # Port 2 on s1 (to s2)
 PORT_B = 3          # Port 3 on s1 (to s3)
 HOST_IN_PORT = 1    # Port 1 on s1 (from h1)
 HOST_DST_IP = "10.0.0.2" # Final destination is h2
+REST_TIMEOUT = 2    # Seconds before a REST call to a dead controller gives up
+# Record layout of /network_state_binary: (port_no u32, tx_bytes u64), little-endian
+PORT_TX_RECORD = struct.Struct('<IQ')
+LONG_POLL_TIMEOUT = 10  # Controller-side wait for a fresh sample (its LONG_POLL_TIMEOUT)
+BASELINE_ATTEMPTS = 10  # Samples to wait at start-up for s1 to report both monitored ports
+
+# One keep-alive connection pool for every Ryu REST call, instead of a new
+# TCP connection per request.
+SESSION = requests.Session()
+SESSION.headers.update({'Content-Type': 'application/json'})
+SESSION.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
+# --- State Encoding ---
+# A state is (Path A level, Path B level); it maps to Q-table row
+# _LVL[a] * 3 + _LVL[b], so STATES[i] is the state stored in row i.
+LEVELS = ('low', 'medium', 'high')
+_LVL = {level: i for i, level in enumerate(LEVELS)}
+STATES = [(a, b) for a in LEVELS for b in LEVELS]
+STATE_LABELS = [str(s) for s in STATES]  # "('low', 'low')" etc., the dashboard's row keys
+# Bytes per second: < 20KB/s is 'low', < 200KB/s is 'medium', more is 'high'
+# (the original 100KB / 1MB per 5 second sample)
+_THRESHOLDS = (20000, 200000)
+
+def encode_state(state):
+    """Q-table row index for a (level_a, level_b) state tuple."""
+    return _LVL[state[0]] * len(LEVELS) + _LVL[state[1]]
 
 class QLearningAgent:
     def __init__(self, action_size):
@@ -37,84 +70,112 @@ class QLearningAgent:
         self.gamma = GAMMA
         self.epsilon = EPSILON_START
         self.learning_rate = LEARNING_RATE
+        self.step = 0       # learn() calls so far; epsilon is a function of it
         
-        # This is the "brain". Instead of a TF model, it's a simple dictionary.
-        self.q_table = defaultdict(lambda: np.zeros(self.action_size))
+        # This is the "brain". Instead of a TF model, it's one preallocated
+        # array: a row per encoded state, a column per action.
+        self.q_table = np.zeros((len(STATES), self.action_size), dtype=np.float32)
 
     def act(self, state):
         """
         Chooses an action using Epsilon-Greedy policy.
         """
-        if np.random.rand() <= self.epsilon:
-            return random.randrange(self.action_size) # Explore
+        # Scalar draws from the stdlib PRNG; getrandbits(1) is a fair 0/1 pick
+        # for the two actions.
+        if random.random() <= self.epsilon:
+            return random.getrandbits(1) # Explore
         
-        q_scores = self.q_table[state]
-        return np.argmax(q_scores) # Exploit
+        idx = encode_state(state)
+        # Two actions: compare them as Python floats. .item() skips the numpy
+        # scalar objects that indexing (and argmax) would go through.
+        q = self.q_table.item
+        return 0 if q(idx, 0) >= q(idx, 1) else 1 # Exploit
 
     def learn(self, state, action, reward, next_state):
         """
         Updates the Q-Table using the Bellman equation.
         """
-        current_q = self.q_table[state][action]
-        next_max_q = np.max(self.q_table[next_state])
+        s_idx, ns_idx = encode_state(state), encode_state(next_state)
+        q = self.q_table.item
+        current_q = q(s_idx, action)
+        next_q0, next_q1 = q(ns_idx, 0), q(ns_idx, 1)
+        next_max_q = next_q0 if next_q0 >= next_q1 else next_q1
         
         # --- The Q-Learning Formula ---
         new_q = (1 - self.learning_rate) * current_q + \
                 self.learning_rate * (reward + self.gamma * next_max_q)
         
-        self.q_table[state][action] = new_q
+        self.q_table[s_idx, action] = new_q
         
-        if self.epsilon > EPSILON_END:
-            self.epsilon *= EPSILON_DECAY
+        # Closed-form decay: no drift from repeated multiplies, and any step
+        # (e.g. a resumed run) maps straight to its epsilon.
+        self.step += 1
+        self.epsilon = max(EPSILON_END, EPSILON_START * EPSILON_DECAY ** self.step)
+
+def get_network_stats(cursor=None):
+    """
+    Fetches s1's port counters from the Ryu API as
+    ({port_no: tx_bytes}, cursor, seconds since the cursor's sample).
 
-def get_network_stats():
-    """Fetches port stats from the Ryu API."""
+    Uses the binary endpoint (12 bytes per port) rather than parsing the
+    full JSON stats of every switch for two numbers. It long-polls: the
+    call returns as soon as the controller has a sample newer than the
+    cursor, a (boot id, seq) pair to pass back on the next call, so the
+    agent runs at the controller's stats cadence instead of a fixed sleep.
+    The seconds come from the controller's measured X-Stats-Interval,
+    times the samples that passed since the cursor's.
+
+    The seconds are None when there is nothing to difference against: on
+    the first call, or after a controller restart (new X-Stats-Boot, or a
+    seq that went backwards). The caller then re-baselines its counters.
+    Returns (None, cursor, None) on error or if no new sample came.
+    """
+    boot, since = cursor or (None, -1)
     try:
-        response = requests.get(f"{RYU_URL}/network_state")
+        response = SESSION.get(f"{RYU_URL}/network_state_binary/{SWITCH_DPID}",
+                               params={'since': since},
+                               timeout=REST_TIMEOUT + LONG_POLL_TIMEOUT)
         response.raise_for_status()
-        return response.json()
+        seq = int(response.headers.get('X-Stats-Seq', 0))
+        new_boot = response.headers.get('X-Stats-Boot')
+        tx = dict(PORT_TX_RECORD.iter_unpack(response.content))
+        if cursor is not None and (new_boot != boot or seq < since):
+            print("Controller restarted; re-baselining the port counters.")
+            return tx, (new_boot, seq), None
+        if seq <= since:
+            print("No new stats from the controller.")
+            return None, cursor, None
+        elapsed = float(response.headers.get('X-Stats-Interval', 1)) * (seq - since) if since >= 0 else None
+        return tx, (new_boot, seq), elapsed
     except Exception as e:
         print(f"Error fetching stats: {e}")
-        return None
+        return None, cursor, None
 
-def discretize_state(port_stats, last_port_tx):
+def port_tx(tx):
+    """(tx_A, tx_B) from s1's {port_no: tx_bytes}, the form counters are carried in."""
+    return tx.get(PORT_A, 0), tx.get(PORT_B, 0)
+
+def discretize_state(tx, last_port_tx, elapsed):
     """
-    Parses raw stats and *discretizes* them into a simple state tuple.
+    Takes s1's {port_no: tx_bytes} and *discretizes* it into a simple state tuple.
+    Counters are carried between calls as a (tx_A, tx_B) tuple; elapsed is
+    the seconds between the two samples, so throughput is in bytes/s.
     """
-    current_port_tx = {PORT_A: 0, PORT_B: 0}
-    
-    s1_stats = port_stats.get(str(SWITCH_DPID), [])
-    
-    for port in s1_stats:
-        # --- THIS IS THE CRITICAL BUG FIX ---
-        port_no = int(port.get('port_no', 0))
-        # ------------------------------------
-        
-        tx_bytes = int(port.get('tx_bytes', 0))
-        
-        if port_no == PORT_A:
-            current_port_tx[PORT_A] = tx_bytes
-        elif port_no == PORT_B:
-            current_port_tx[PORT_B] = tx_bytes
+    tx_A, tx_B = port_tx(tx)
+    last_tx_A, last_tx_B = last_port_tx
 
-    throughput_A = current_port_tx[PORT_A] - last_port_tx[PORT_A]
-    throughput_B = current_port_tx[PORT_B] - last_port_tx[PORT_B]
+    throughput_A = (tx_A - last_tx_A) / elapsed
+    throughput_B = (tx_B - last_tx_B) / elapsed
     
     if throughput_A < 0: throughput_A = 0
     if throughput_B < 0: throughput_B = 0
 
-    def get_traffic_level(throughput):
-        if throughput < 100000: # Less than 100KB
-            return 'low'
-        elif throughput < 1000000: # Less than 1MB
-            return 'medium'
-        else: # 1MB+
-            return 'high'
-
-    state = (get_traffic_level(throughput_A), get_traffic_level(throughput_B))
-    raw_throughput = [throughput_A, throughput_B]
+    # bisect_right counts the thresholds <= throughput, i.e. the level index
+    state = (LEVELS[bisect_right(_THRESHOLDS, throughput_A)],
+             LEVELS[bisect_right(_THRESHOLDS, throughput_B)])
+    raw_throughput = (throughput_A, throughput_B)
     
-    return state, current_port_tx, raw_throughput
+    return state, (tx_A, tx_B), raw_throughput
 
 def calculate_reward(raw_throughput):
     """
@@ -148,7 +209,7 @@ def execute_action(action):
     }
     
     try:
-        response = requests.post(f"{RYU_URL}/reroute_flow", json=flow_rule)
+        response = SESSION.post(f"{RYU_URL}/reroute_flow", json=flow_rule, timeout=REST_TIMEOUT)
         response.raise_for_status()
         print(f"  SUCCESS: Flow rule for Port {port_to_use} added.")
     except Exception as e:
@@ -158,13 +219,17 @@ def execute_action(action):
 def update_controller_q_table(agent):
     """Sends the agent's Q-Table to the Ryu controller for the dashboard."""
     
-    # We must convert the defaultdict to a plain dict for JSON
-    # And convert state tuples (('low', 'low')) to strings
-    # And convert numpy arrays to simple lists
-    q_table_serializable = {str(k): v.tolist() for k, v in agent.q_table.items()}
+    # We must map the array rows back to their state labels for JSON.
+    # orjson serializes the numpy rows directly; plain json needs lists.
+    if orjson is not None:
+        payload = orjson.dumps(dict(zip(STATE_LABELS, agent.q_table)),
+                               option=orjson.OPT_SERIALIZE_NUMPY)
+    else:
+        payload = json.dumps(dict(zip(STATE_LABELS, agent.q_table.tolist())))
     
     try:
-        requests.post(f"{RYU_URL}/update_q_table", json=q_table_serializable)
+        # SESSION already sends Content-Type: application/json
+        SESSION.post(f"{RYU_URL}/update_q_table", data=payload, timeout=REST_TIMEOUT)
         # We don't need to print this every time
         # print("  Q-Table successfully sent to controller dashboard.")
     except Exception as e:
@@ -172,29 +237,47 @@ def update_controller_q_table(agent):
 
 # --- Main Learning Loop ---
 def main():
+    parser = argparse.ArgumentParser(description="Q-learning TE agent for the Ryu controller.")
+    parser.add_argument('--no-dashboard', action='store_true',
+                        help="don't push the Q-Table to the controller's dashboard")
+    args = parser.parse_args()
+
     agent = QLearningAgent(ACTION_SIZE)
     
     # Initialize last_port_tx to avoid a huge negative value on first run
     print("Initializing agent... fetching initial network state.")
-    initial_stats = get_network_stats()
-    if not initial_stats:
+    initial_stats, cursor, _ = get_network_stats()
+    if initial_stats is None:
         print("Could not contact controller. Exiting.")
         return
+    # An empty reply (s1 hasn't sent port stats yet) would baseline at (0, 0)
+    # and make episode 1 difference the cumulative counters
+    attempts = 1
+    while initial_stats is None or not (PORT_A in initial_stats and PORT_B in initial_stats):
+        if attempts >= BASELINE_ATTEMPTS:
+            print(f"s1 did not report ports {PORT_A} and {PORT_B}. Exiting.")
+            return
+        print(f"Waiting for s1 to report ports {PORT_A} and {PORT_B}...")
+        initial_stats, cursor, _ = get_network_stats(cursor)
+        attempts += 1
         
-    _, last_port_tx, _ = discretize_state(initial_stats, {PORT_A: 0, PORT_B: 0})
+    last_port_tx = port_tx(initial_stats)
     print("Initialization complete. Starting learning loop.")
 
     for e in range(1, 1001):
         print(f"\n--- Episode {e} (Epsilon: {agent.epsilon:.3f}) ---")
         
         # 1. OBSERVE (State)
-        port_stats = get_network_stats()
-        if not port_stats:
+        port_stats, cursor, elapsed = get_network_stats(cursor)
+        if port_stats is None:
             print("Could not get stats, sleeping...")
             time.sleep(5)
             continue
+        if elapsed is None:
+            last_port_tx = port_tx(port_stats)
+            continue
             
-        state, current_port_tx, raw_throughput = discretize_state(port_stats, last_port_tx)
+        state, current_port_tx, raw_throughput = discretize_state(port_stats, last_port_tx, elapsed)
         
         # 2. DECIDE (Action)
         action = agent.act(state) # 0 or 1
@@ -203,14 +286,19 @@ def main():
         execute_action(action)
         
         # 4. GET FEEDBACK (New State & Reward)
+        # Long-polls for the next controller sample, one stats interval on
         print("  Waiting for new state...")
-        time.sleep(5)
-        
-        new_port_stats = get_network_stats()
-        if not new_port_stats:
+        new_port_stats, cursor, elapsed = get_network_stats(cursor)
+        if new_port_stats is None:
+            # cursor still points at the observed sample; baseline on it too,
+            # so the next episode's elapsed spans the counters it differences
+            last_port_tx = current_port_tx
+            continue
+        if elapsed is None:
+            last_port_tx = port_tx(new_port_stats)
             continue
             
-        next_state, next_port_tx, next_raw_throughput = discretize_state(new_port_stats, current_port_tx)
+        next_state, next_port_tx, next_raw_throughput = discretize_state(new_port_stats, current_port_tx, elapsed)
         
         # 5. CALCULATE REWARD
         reward = calculate_reward(next_raw_throughput)
@@ -225,11 +313,12 @@ def main():
         # Print Q-Table and send to dashboard every 20 episodes
         if e % 20 == 0:
             print("--- Q-Table ---")
-            for s, q in agent.q_table.items():
+            for s, q in zip(STATES, agent.q_table):
                 print(f"  {s}: {q}")
             
             # --- THIS IS THE NEW LINE ---
-            update_controller_q_table(agent)
+            if not args.no_dashboard:
+                update_controller_q_table(agent)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,58 @@
+"""
+Pieces of the L2 learning switch shared by the Ryu apps in this directory
+(simple_switch2.py, static_path_controller.py, project_controller.py).
+
+ryu-manager puts an app's directory on sys.path when it loads it, so the
+apps import this module directly. It holds no RyuApp, so ryu-manager never
+starts it as an app of its own.
+"""
+
+import struct
+
+from ryu.controller import ofp_event
+from ryu.controller.handler import MAIN_DISPATCHER
+from ryu.controller.handler import set_ev_cls
+
+# Ethernet header: dst MAC, src MAC, ethertype. Decoding these 14 bytes
+# directly skips building ryu's packet object graph for every packet-in.
+ETH_HEADER = struct.Struct('!6s6sH')
+
+MAC_TABLE_SIZE = 65536  # learned MACs kept per switch; the oldest is evicted beyond this
+
+
+class MacTable(dict):
+    """A switch's MAC -> port dict, bounded to MAC_TABLE_SIZE entries."""
+
+    def learn(self, mac, port):
+        # Known MAC on the same port (the common case): one lookup, no writes
+        if self.get(mac) == port:
+            return
+        # New or moved: re-insert at the end; dicts keep insertion order, so
+        # the first key is the one learned longest ago
+        self.pop(mac, None)
+        if len(self) >= MAC_TABLE_SIZE:
+            del self[next(iter(self))]
+        self[mac] = port
+
+
+class OutputActions(dict):
+    """A switch's port -> [OFPActionOutput(port)] dict, each list built on first use and reused for every packet."""
+
+    def __init__(self, action_output):
+        super(OutputActions, self).__init__()
+        self.action_output = action_output  # the app's OFPActionOutput for its OpenFlow version
+
+    def __missing__(self, port):
+        actions = self[port] = [self.action_output(port)]
+        return actions
+
+
+class OutputActionsMixin(object):
+    """For apps keeping self.output_actions = {dpid: OutputActions}."""
+
+    @set_ev_cls(ofp_event.EventOFPPortStatus, MAIN_DISPATCHER)
+    def _port_status_handler(self, ev):
+        """Drop a deleted port's cached output actions."""
+        msg = ev.msg
+        if msg.reason == msg.datapath.ofproto.OFPPR_DELETE:
+            self.output_actions[msg.datapath.id].pop(msg.desc.port_no, None)
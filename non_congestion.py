@@ -2,19 +2,30 @@
 """
 A Mininet script to create a network with 4 senders and 1 receiver,
 generating predictable, non-congested traffic for clean Wireshark captures.
+
+Usage: sudo python3 -O non_congestion.py
+Mininet is imported inside the functions that use it, after argument
+parsing, so -h is instant and the functions still work when imported.
 """
-from mininet.net import Mininet
-# MODIFICATION 1: Import OVSController instead of the generic Controller
-from mininet.node import OVSController
-from mininet.cli import CLI
-from mininet.link import TCLink
-from mininet.log import setLogLevel, info
+import argparse
 import time
-import os
+from pathlib import Path
+from subprocess import DEVNULL
+
+from capture_common import (CAPTURE_FILTER, capture_affinity, client_affinity, start_iperf_server,
+                            stop_iperf_server, stop_procs)
+
 
 def create_clean_network():
     """Create and configure the network topology."""
-    os.system('sudo mn -c >/dev/null 2>&1')
+    from mininet.clean import cleanup as mn_cleanup
+    from mininet.net import Mininet
+    # MODIFICATION 1: Import OVSController instead of the generic Controller
+    from mininet.node import OVSController
+    from mininet.link import TCLink
+    from mininet.log import info
+
+    mn_cleanup()
 
     # MODIFICATION 2: Use the built-in OVSController
     net = Mininet(controller=OVSController, link=TCLink, cleanup=True)
@@ -42,26 +53,31 @@ def create_clean_network():
 
 def run_traffic_test(net):
     """Run the iperf3 traffic test and capture packets."""
-    os.system('rm -f /tmp/*.pcap')
+    from mininet.log import info
+
+    for old in Path('/tmp').glob('*.pcap'):
+        old.unlink()
 
-    info('*** Starting tcpdump on all hosts\n')
-    for host in net.hosts:
-        host.cmd(f'tcpdump -w /tmp/{host.name}.pcap -i {host.intf()} &')
+    # One capture on the switch side of the receiver link sees all four flows
+    s1, receiver = net.get('s1', 'h5')
+    bottleneck_intf = s1.connectionsTo(receiver)[0][0]
+    info(f'*** Starting tcpdump on {bottleneck_intf}\n')
+    tcpdumps = [s1.popen([*capture_affinity(), 'tcpdump', '-i', str(bottleneck_intf), '-w', '/tmp/bottleneck.pcap',
+                          '-s', '96', '-B', '16384', '--immediate-mode', CAPTURE_FILTER],
+                         stdout=DEVNULL, stderr=DEVNULL)]
 
     time.sleep(1)
 
-    receiver = net.get('h5')
     info(f'*** Starting iperf3 server on {receiver.name}\n')
-    receiver.cmd('iperf3 -s &')
-    
-    time.sleep(1)
+    start_iperf_server(receiver)
 
     senders = [net.get(f'h{i+1}') for i in range(4)]
     client_procs = []
+    client_cmd = ['iperf3', '-c', receiver.IP(), '-t', '10', '-b', '5M']  # same for every sender
     
     info(f'*** Starting iperf3 clients from h1-h4 to {receiver.name}\n')
-    for sender in senders:
-        proc = sender.popen(f'iperf3 -c {receiver.IP()} -t 10 -b 5M')
+    for i, sender in enumerate(senders):
+        proc = sender.popen(client_cmd + client_affinity(i))
         client_procs.append(proc)
 
     info('*** Traffic running for 10 seconds. Waiting for clients to finish...\n')
@@ -72,14 +88,19 @@ def run_traffic_test(net):
     
     time.sleep(2)
 
-    receiver.cmd('kill %iperf3')
-    for host in net.hosts:
-        host.cmd('kill %tcpdump')
+    stop_iperf_server()
+    stop_procs(tcpdumps)
 
-    info('*** Done. Check /tmp/*.pcap files for Wireshark\n')
+    info('*** Done. Check /tmp/bottleneck.pcap in Wireshark\n')
 
 
 if __name__ == '__main__':
+    argparse.ArgumentParser(description='Non-congested 4-to-1 traffic with a bottleneck capture.').parse_args()
+
+    # Deferred until after parsing: loading the Mininet stack is the slow part of startup
+    from mininet.cli import CLI
+    from mininet.log import setLogLevel
+
     setLogLevel('info')
     network = create_clean_network()
     run_traffic_test(network)
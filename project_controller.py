@@ -9,23 +9,33 @@ This controller combines two functions:
 
 from ryu.base import app_manager
 from ryu.controller import ofp_event
-from ryu.controller.handler import CONFIG_DISPATCHER, MAIN_DISPATCHER
+from ryu.controller.handler import CONFIG_DISPATCHER, MAIN_DISPATCHER, DEAD_DISPATCHER
 from ryu.controller.handler import set_ev_cls
-from ryu.ofproto import ofproto_v1_0
-from ryu.lib.packet import packet
-from ryu.lib.packet import ethernet
+from ryu.ofproto import ofproto_v1_0, ofproto_v1_0_parser
 from ryu.lib import hub
-from operator import attrgetter
+import logging
+from l2_common import ETH_HEADER, MacTable, OutputActions, OutputActionsMixin
 
-class ProjectController(app_manager.RyuApp):
+# OpenFlow 1.0 names used by the handlers (OFP_VERSIONS pins this version)
+OFPP_FLOOD = ofproto_v1_0.OFPP_FLOOD
+OFP_NO_BUFFER = ofproto_v1_0.OFP_NO_BUFFER
+OFPActionOutput = ofproto_v1_0_parser.OFPActionOutput
+OFPMatch = ofproto_v1_0_parser.OFPMatch
+OFPPacketOut = ofproto_v1_0_parser.OFPPacketOut
+
+OFPP_MAX = ofproto_v1_0.OFPP_MAX  # physical ports are numbered below this; the rest are reserved
+
+
+class ProjectController(OutputActionsMixin, app_manager.RyuApp):
     OFP_VERSIONS = [ofproto_v1_0.OFP_VERSION]
 
     def __init__(self, *args, **kwargs):
         super(ProjectController, self).__init__(*args, **kwargs)
         # MAC-to-port table for L2 switching
         self.mac_to_port = {}
-        # List of connected switches (datapaths)
-        self.datapaths = []
+        self.output_actions = {} # {dpid: OutputActions}, port -> [OFPActionOutput(port)]
+        # Connected switches (datapaths), keyed by dpid
+        self.datapaths = {}
         # Start the monitoring thread
         self.monitor_thread = hub.spawn(self._monitor)
         self.logger.info("Project Controller Started...")
@@ -41,9 +51,10 @@ class ProjectController(app_manager.RyuApp):
         ofproto = datapath.ofproto
         parser = datapath.ofproto_parser
 
-        # Add this datapath to our list for monitoring
-        if datapath not in self.datapaths:
-            self.datapaths.append(datapath)
+        # Add this datapath to our table for monitoring
+        self.datapaths[datapath.id] = datapath
+        self.mac_to_port[datapath.id] = MacTable()
+        self.output_actions[datapath.id] = OutputActions(OFPActionOutput)
 
         # Install table-miss flow entry (sends all packets to controller)
         match = parser.OFPMatch()
@@ -53,7 +64,7 @@ class ProjectController(app_manager.RyuApp):
                                           0)]
         
         self.add_flow(datapath, 0, match, actions)
-        self.logger.info(f"Switch {datapath.id} connected. Default flow installed.")
+        self.logger.info("Switch %s connected. Default flow installed.", datapath.id)
 
     def add_flow(self, datapath, priority, match, actions):
         """
@@ -75,41 +86,45 @@ class ProjectController(app_manager.RyuApp):
         """
         msg = ev.msg
         datapath = msg.datapath
-        ofproto = datapath.ofproto
-        parser = datapath.ofproto_parser
         in_port = msg.in_port
 
-        pkt = packet.Packet(msg.data)
-        eth = pkt.get_protocol(ethernet.ethernet)
+        if len(msg.data) < ETH_HEADER.size:
+            return
+        dst, src, _ = ETH_HEADER.unpack_from(msg.data)
         dpid = datapath.id
         
         # learn a mac address to avoid FLOOD next time.
-        self_mac_to_port = self.mac_to_port.setdefault(dpid, {})
-        self.mac_to_port[dpid][eth.src] = in_port
+        # (MACs stay as the raw 6 bytes, which is also what OF1.0's dl_dst takes)
+        mac_table = self.mac_to_port[dpid]
+        mac_table.learn(src, in_port)
 
         # determine output port
-        if eth.dst in self.mac_to_port[dpid]:
-            out_port = self.mac_to_port[dpid][eth.dst]
-        else:
-            out_port = ofproto.OFPP_FLOOD
+        out_port = mac_table.get(dst, OFPP_FLOOD)
 
-        actions = [parser.OFPActionOutput(out_port)]
+        actions = self.output_actions[dpid][out_port]
 
         # install a flow to avoid packet_in next time
-        if out_port != ofproto.OFPP_FLOOD:
-            match = parser.OFPMatch(in_port=in_port, dl_dst=eth.dst)
+        if out_port != OFPP_FLOOD:
+            match = OFPMatch(in_port=in_port, dl_dst=dst)
             self.add_flow(datapath, 1, match, actions)
 
         # Send packet out
         data = None
-        if msg.buffer_id == ofproto.OFP_NO_BUFFER:
+        if msg.buffer_id == OFP_NO_BUFFER:
             data = msg.data
-        out = parser.OFPPacketOut(datapath=datapath, buffer_id=msg.buffer_id,
-                                  in_port=in_port, actions=actions, data=data)
+        out = OFPPacketOut(datapath=datapath, buffer_id=msg.buffer_id,
+                           in_port=in_port, actions=actions, data=data)
         datapath.send_msg(out)
 
     # ===== Statistics Monitor Logic =====
 
+    @set_ev_cls(ofp_event.EventOFPStateChange, DEAD_DISPATCHER)
+    def _state_change_handler(self, ev):
+        """
+        Forget a disconnected switch so the monitor stops polling it.
+        """
+        self.datapaths.pop(ev.datapath.id, None)
+
     def _monitor(self):
         """
         Monitoring thread. Runs in the background.
@@ -118,7 +133,7 @@ class ProjectController(app_manager.RyuApp):
             # Wait for 10 seconds before polling again
             hub.sleep(10)
             self.logger.info("Polling switches for statistics...")
-            for dp in self.datapaths:
+            for dp in list(self.datapaths.values()):
                 self._request_stats(dp)
 
     def _request_stats(self, datapath):
@@ -137,20 +152,31 @@ class ProjectController(app_manager.RyuApp):
         """
         Handle the reply from a switch.
         """
+        # This handler only logs: skip the ordering and per-port formatting
+        # below entirely when INFO records would be dropped anyway
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
+
         body = ev.msg.body
         dpid = ev.msg.datapath.id
+
+        # Order by port with a bucket per port number, O(N): physical port
+        # numbers are small and dense. Reserved ports (the virtual "local"
+        # port included) are >= OFPP_MAX and skipped.
+        physical = [stat for stat in body if stat.port_no < OFPP_MAX]
+        buckets = [None] * (max((stat.port_no for stat in physical), default=-1) + 1)
+        for stat in physical:
+            buckets[stat.port_no] = stat
         
-        # Log the stats
-        self.logger.info(f"\n===== PORT STATS FOR SWITCH {dpid} =====")
-        for stat in sorted(body, key=attrgetter('port_no')):
-            # Skip virtual "local" port
-            if stat.port_no == ofproto_v1_0.OFPP_LOCAL:
-                continue
-            self.logger.info(f" Port {stat.port_no}: "
-                             f" RX Pkts: {stat.rx_packets:<8} |"
-                             f" TX Pkts: {stat.tx_packets:<8} |"
-                             f" RX Bytes: {stat.rx_bytes:<8} |"
-                             f" TX Bytes: {stat.tx_bytes:<8} |"
-                             f" RX Drops: {stat.rx_dropped:<5} |"
-                             f" TX Drops: {stat.tx_dropped:<5}")
-        self.logger.info(f"======================================\n")
\ No newline at end of file
+        # Log the stats: the whole table as one record (one handler lock,
+        # one write) rather than a logger call per port
+        lines = [f" Port {stat.port_no}: "
+                 f" RX Pkts: {stat.rx_packets:<8} |"
+                 f" TX Pkts: {stat.tx_packets:<8} |"
+                 f" RX Bytes: {stat.rx_bytes:<8} |"
+                 f" TX Bytes: {stat.tx_bytes:<8} |"
+                 f" RX Drops: {stat.rx_dropped:<5} |"
+                 f" TX Drops: {stat.tx_dropped:<5}"
+                 for stat in buckets if stat is not None]
+        self.logger.info("\n===== PORT STATS FOR SWITCH %s =====\n%s\n"
+                         "======================================\n", dpid, "\n".join(lines))
\ No newline at end of file
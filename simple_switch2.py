@@ -2,33 +2,46 @@ from ryu.base import app_manager
 from ryu.controller import ofp_event
 from ryu.controller.handler import CONFIG_DISPATCHER, MAIN_DISPATCHER
 from ryu.controller.handler import set_ev_cls
-from ryu.ofproto import ofproto_v1_3
-from ryu.lib.packet import packet, ethernet, ether_types
+from ryu.ofproto import ofproto_v1_3, ofproto_v1_3_parser
+from ryu.lib import hub
+from ryu.lib.packet import ether_types
+from l2_common import ETH_HEADER, MacTable, OutputActions, OutputActionsMixin
 import time
 
 
-class SimpleSwitch13Monitor(app_manager.RyuApp):
+# OpenFlow 1.3 names used by the handlers (OFP_VERSIONS pins this version)
+OFPP_FLOOD = ofproto_v1_3.OFPP_FLOOD
+OFP_NO_BUFFER = ofproto_v1_3.OFP_NO_BUFFER
+OFPActionOutput = ofproto_v1_3_parser.OFPActionOutput
+OFPMatch = ofproto_v1_3_parser.OFPMatch
+OFPPacketOut = ofproto_v1_3_parser.OFPPacketOut
+
+
+class SimpleSwitch13Monitor(OutputActionsMixin, app_manager.RyuApp):
     OFP_VERSIONS = [ofproto_v1_3.OFP_VERSION]
 
     def __init__(self, *args, **kwargs):
         super(SimpleSwitch13Monitor, self).__init__(*args, **kwargs)
         self.mac_to_port = {}
-        self.pkt_count = {}        # {dpid: {'in': X, 'out': Y}}
+        self.output_actions = {} # {dpid: OutputActions}, port -> [OFPActionOutput(port)]
+        self.pkt_count = {}        # {dpid: {'in': X, 'out': Y}}, keyed by the int datapath.id
         self.monitor_interval = 5  # seconds
 
-        # Start periodic monitoring
-        self._start_monitor()
+        # Start periodic monitoring: one green thread on Ryu's hub, not an
+        # OS thread per tick
+        self.monitor_thread = hub.spawn(self._monitor)
+
+    def _monitor(self):
+        while True:
+            hub.sleep(self.monitor_interval)
+            self._log_counts()
 
-    def _start_monitor(self):
-        from threading import Timer
-        def monitor():
-            for dpid in self.pkt_count:
-                sent = self.pkt_count[dpid].get('out', 0)
-                received = self.pkt_count[dpid].get('in', 0)
-                loss = max(0, sent - received)
-                self.logger.info(f"[MONITOR] DPID {dpid}: sent={sent}, received={received}, loss={loss}")
-            Timer(self.monitor_interval, monitor).start()
-        Timer(self.monitor_interval, monitor).start()
+    def _log_counts(self):
+        for dpid in self.pkt_count:
+            sent = self.pkt_count[dpid].get('out', 0)
+            received = self.pkt_count[dpid].get('in', 0)
+            loss = max(0, sent - received)
+            self.logger.info("[MONITOR] DPID %016x: sent=%d, received=%d, loss=%d", dpid, sent, received, loss)
 
     @set_ev_cls(ofp_event.EventOFPSwitchFeatures, CONFIG_DISPATCHER)
     def switch_features_handler(self, ev):
@@ -40,8 +53,12 @@ class SimpleSwitch13Monitor(app_manager.RyuApp):
         actions = [parser.OFPActionOutput(ofproto.OFPP_CONTROLLER, ofproto.OFPCML_NO_BUFFER)]
         self.add_flow(datapath, 0, match, actions)
 
-        dpid = format(datapath.id, "d").zfill(16)
-        self.pkt_count.setdefault(dpid, {'in': 0, 'out': 0})
+        # Per-switch tables are created here, once per connect, so the
+        # packet-in path can index them directly.
+        dpid = datapath.id
+        self.mac_to_port[dpid] = MacTable()
+        self.output_actions[dpid] = OutputActions(OFPActionOutput)
+        self.pkt_count[dpid] = {'in': 0, 'out': 0}
 
     def add_flow(self, datapath, priority, match, actions, buffer_id=None):
         parser = datapath.ofproto_parser
@@ -59,40 +76,37 @@ class SimpleSwitch13Monitor(app_manager.RyuApp):
     def _packet_in_handler(self, ev):
         msg = ev.msg
         datapath = msg.datapath
-        ofproto = datapath.ofproto
-        parser = datapath.ofproto_parser
         in_port = msg.match['in_port']
 
-        pkt = packet.Packet(msg.data)
-        eth = pkt.get_protocols(ethernet.ethernet)[0]
+        if len(msg.data) < ETH_HEADER.size:
+            return
+        dst, src, ethertype = ETH_HEADER.unpack_from(msg.data)
 
-        if eth.ethertype == ether_types.ETH_TYPE_LLDP:
+        if ethertype == ether_types.ETH_TYPE_LLDP:
             return
 
-        src = eth.src
-        dst = eth.dst
-        dpid = format(datapath.id, "d").zfill(16)
-        self.mac_to_port.setdefault(dpid, {})
-        self.pkt_count.setdefault(dpid, {'in': 0, 'out': 0})
+        dpid = datapath.id
         self.pkt_count[dpid]['in'] += 1
 
-        self.mac_to_port[dpid][src] = in_port
-        out_port = self.mac_to_port[dpid].get(dst, ofproto.OFPP_FLOOD)
+        mac_table = self.mac_to_port[dpid]
+        mac_table.learn(src, in_port)
+        out_port = mac_table.get(dst, OFPP_FLOOD)
 
-        actions = [parser.OFPActionOutput(out_port)]
-        if out_port != ofproto.OFPP_FLOOD:
-            match = parser.OFPMatch(in_port=in_port, eth_src=src, eth_dst=dst)
-            if msg.buffer_id != ofproto.OFP_NO_BUFFER:
+        actions = self.output_actions[dpid][out_port]
+        if out_port != OFPP_FLOOD:
+            # MACs are learned as raw bytes; OF1.3's OFPMatch takes the text form
+            match = OFPMatch(in_port=in_port, eth_src=src.hex(':'), eth_dst=dst.hex(':'))
+            if msg.buffer_id != OFP_NO_BUFFER:
                 self.add_flow(datapath, 1, match, actions, msg.buffer_id)
             else:
                 self.add_flow(datapath, 1, match, actions)
 
-        data = msg.data if msg.buffer_id == ofproto.OFP_NO_BUFFER else None
-        out = parser.OFPPacketOut(datapath=datapath,
-                                  buffer_id=msg.buffer_id,
-                                  in_port=in_port,
-                                  actions=actions,
-                                  data=data)
+        data = msg.data if msg.buffer_id == OFP_NO_BUFFER else None
+        out = OFPPacketOut(datapath=datapath,
+                           buffer_id=msg.buffer_id,
+                           in_port=in_port,
+                           actions=actions,
+                           data=data)
         datapath.send_msg(out)
-        if out_port != ofproto.OFPP_FLOOD:
+        if out_port != OFPP_FLOOD:
             self.pkt_count[dpid]['out'] += 1
@@ -7,103 +7,127 @@ from ryu.base import app_manager
 from ryu.controller import ofp_event
 from ryu.controller.handler import CONFIG_DISPATCHER, MAIN_DISPATCHER
 from ryu.controller.handler import set_ev_cls
-from ryu.ofproto import ofproto_v1_3
-from ryu.lib.packet import packet
-from ryu.lib.packet import ethernet
+from ryu.ofproto import ofproto_v1_3, ofproto_v1_3_parser
 from ryu.lib.packet import ether_types
-
-class StaticPathController(app_manager.RyuApp):
+from l2_common import ETH_HEADER, MacTable, OutputActions, OutputActionsMixin
+
+# OpenFlow 1.3 names used by the handlers (OFP_VERSIONS pins this version)
+OFPP_FLOOD = ofproto_v1_3.OFPP_FLOOD
+OFP_NO_BUFFER = ofproto_v1_3.OFP_NO_BUFFER
+OFPActionOutput = ofproto_v1_3_parser.OFPActionOutput
+OFPMatch = ofproto_v1_3_parser.OFPMatch
+OFPPacketOut = ofproto_v1_3_parser.OFPPacketOut
+
+# DPIDs and subnets from your college_topology.py script
+D1_DPID, C1_DPID, D2_DPID = 257, 1, 513
+CSE_SUBNET = '10.0.1.0/24'
+ECE_SUBNET = '10.0.2.0/24'
+STATIC_PRIORITY = 10  # above the L2 learning flows (1) and the table-miss (0)
+ARP_FLOOD_PRIORITY = 2  # broadcast ARP floods in the switch, ahead of the L2 learning flows
+
+# The static CSE <--> ECE path via core switch c1, split per switch so each
+# switch gets its share as soon as it connects.
+# dpid -> [(in_port or None for any, ipv4_dst, out_port)]
+# Port numbers based on link creation order in college_topology.py
+STATIC_PATHS = {
+    D1_DPID: [(None, ECE_SUBNET, 1)],   # d1 -> c1 is on d1's port 1
+    C1_DPID: [(2, ECE_SUBNET, 3),       # c1 -> d2 is on c1's port 3
+              (3, CSE_SUBNET, 2)],      # c1 -> d1 is on c1's port 2 (return path)
+    D2_DPID: [(None, CSE_SUBNET, 1)],   # d2 -> c1 is on d2's port 1
+}
+
+def _ipv4_match(in_port, ipv4_dst):
+    if in_port is None:
+        return OFPMatch(eth_type=0x0800, ipv4_dst=ipv4_dst)
+    return OFPMatch(in_port=in_port, eth_type=0x0800, ipv4_dst=ipv4_dst)
+
+# STATIC_PATHS and the table-miss entry as ready (match, actions) objects,
+# built once at import: their shapes never change, and a FlowMod only reads
+# them when it is serialized, so every connect (and reconnect) reuses them.
+STATIC_RULES = {dpid: [(_ipv4_match(in_port, ipv4_dst), [OFPActionOutput(out_port)])
+                       for in_port, ipv4_dst, out_port in rules]
+                for dpid, rules in STATIC_PATHS.items()}
+TABLE_MISS_MATCH = OFPMatch()
+TABLE_MISS_ACTIONS = [OFPActionOutput(ofproto_v1_3.OFPP_CONTROLLER, ofproto_v1_3.OFPCML_NO_BUFFER)]
+ARP_FLOOD_MATCH = OFPMatch(eth_type=ether_types.ETH_TYPE_ARP, eth_dst='ff:ff:ff:ff:ff:ff')
+ARP_FLOOD_ACTIONS = [OFPActionOutput(OFPP_FLOOD)]
+
+
+class StaticPathController(OutputActionsMixin, app_manager.RyuApp):
     OFP_VERSIONS = [ofproto_v1_3.OFP_VERSION]
 
     def __init__(self, *args, **kwargs):
         super(StaticPathController, self).__init__(*args, **kwargs)
         self.mac_to_port = {}
+        self.output_actions = {} # {dpid: OutputActions}, port -> [OFPActionOutput(port)]
         self.switches = {} # To store datapath objects
-        self.paths_installed = False # Flag to ensure paths are installed only once
+        self.paths_pending = set(STATIC_PATHS) # Path switches that haven't connected yet
 
     @set_ev_cls(ofp_event.EventOFPSwitchFeatures, CONFIG_DISPATCHER)
     def switch_features_handler(self, ev):
         datapath = ev.msg.datapath
         dpid = datapath.id
         self.switches[dpid] = datapath
-        self.mac_to_port.setdefault(dpid, {})
-        self.logger.info(f"*** Switch {dpid:016x} connected.")
+        self.mac_to_port[dpid] = MacTable() # Fresh per connect; _packet_in_handler indexes it directly
+        self.output_actions[dpid] = OutputActions(OFPActionOutput)
+        self.logger.info("*** Switch %016x connected.", dpid)
         
         # Install a default table-miss flow entry to send unknown packets to the controller
-        ofproto = datapath.ofproto
-        parser = datapath.ofproto_parser
-        match = parser.OFPMatch()
-        actions = [parser.OFPActionOutput(ofproto.OFPP_CONTROLLER, ofproto.OFPCML_NO_BUFFER)]
-        self.add_flow(datapath, 0, match, actions)
-
-        # Once all 8 switches have connected, install the static paths
-        if len(self.switches) == 8 and not self.paths_installed:
-            self.logger.info("\n*** All 8 switches connected. Installing static flow rules. ***\n")
-            self.install_static_paths()
-            self.paths_installed = True
-
-    def add_flow(self, datapath, priority, match, actions, buffer_id=None):
+        mods = [self.flow_mod(datapath, 0, TABLE_MISS_MATCH, TABLE_MISS_ACTIONS)]
+        # ARP requests (broadcast) are flooded by the switch itself instead of
+        # a packet-in each. Unicast ARP replies still reach _packet_in_handler,
+        # which learns the MACs from them and installs the L2 flows.
+        mods.append(self.flow_mod(datapath, ARP_FLOOD_PRIORITY, ARP_FLOOD_MATCH, ARP_FLOOD_ACTIONS))
+
+        # Proactively install this switch's part of the static path right away,
+        # so path traffic never waits for the other switches or a packet_in.
+        # It goes out in the same burst as the table-miss entry.
+        if dpid in STATIC_PATHS:
+            mods += self.static_path_mods(datapath)
+        self._add_flows_batch(datapath, mods)
+        if dpid in STATIC_PATHS:
+            self.static_paths_installed(dpid)
+
+    def flow_mod(self, datapath, priority, match, actions, buffer_id=None):
         """
-        Helper function to add a flow entry.
+        Builds the OFPFlowMod for a flow entry, without sending it.
         CORRECTED: Now correctly handles the optional buffer_id.
         """
         ofproto = datapath.ofproto
         parser = datapath.ofproto_parser
         inst = [parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS, actions)]
         if buffer_id:
-            mod = parser.OFPFlowMod(datapath=datapath, buffer_id=buffer_id,
-                                    priority=priority, match=match,
-                                    instructions=inst)
-        else:
-            mod = parser.OFPFlowMod(datapath=datapath, priority=priority,
-                                    match=match, instructions=inst)
-        datapath.send_msg(mod)
-
-    def install_static_paths(self):
-        """Installs hard-coded paths for CSE <--> ECE traffic via core switch c1."""
-        
-        # DPIDs from your college_topology.py script
-        d1_dpid, c1_dpid, d2_dpid = 257, 1, 513
-        
-        d1 = self.switches.get(d1_dpid)
-        c1 = self.switches.get(c1_dpid)
-        d2 = self.switches.get(d2_dpid)
-        
-        if not all([d1, c1, d2]):
-            self.logger.error("Could not find all required switches (d1, c1, d2). Aborting static path installation.")
-            return
+            return parser.OFPFlowMod(datapath=datapath, buffer_id=buffer_id,
+                                     priority=priority, match=match,
+                                     instructions=inst)
+        return parser.OFPFlowMod(datapath=datapath, priority=priority,
+                                 match=match, instructions=inst)
 
-        parser_d1, parser_c1, parser_d2 = d1.ofproto_parser, c1.ofproto_parser, d2.ofproto_parser
-        
-        # IP subnets from your college_topology.py script
-        cse_subnet = '10.0.1.0/24'
-        ece_subnet = '10.0.2.0/24'
-
-        # Path: CSE -> ECE via c1
-        # Port numbers based on link creation order in college_topology.py
-        # d1 -> c1 is on d1's port 1
-        # c1 -> d2 is on c1's port 3
-        match = parser_d1.OFPMatch(eth_type=0x0800, ipv4_dst=ece_subnet)
-        actions = [parser_d1.OFPActionOutput(1)]
-        self.add_flow(d1, 10, match, actions)
-        
-        match = parser_c1.OFPMatch(in_port=2, eth_type=0x0800, ipv4_dst=ece_subnet)
-        actions = [parser_c1.OFPActionOutput(3)]
-        self.add_flow(c1, 10, match, actions)
-
-        # Path: ECE -> CSE via c1 (Return Path)
-        # d2 -> c1 is on d2's port 1
-        # c1 -> d1 is on c1's port 2
-        match = parser_d2.OFPMatch(eth_type=0x0800, ipv4_dst=cse_subnet)
-        actions = [parser_d2.OFPActionOutput(1)]
-        self.add_flow(d2, 10, match, actions)
-        
-        match = parser_c1.OFPMatch(in_port=3, eth_type=0x0800, ipv4_dst=cse_subnet)
-        actions = [parser_c1.OFPActionOutput(2)]
-        self.add_flow(c1, 10, match, actions)
-        
-        self.logger.info("*** Static path rules installed: CSE <--> ECE via c1. ***")
-        self.logger.info("*** The path through c2 is now idle, ready for the AI agent. ***\n")
+    def add_flow(self, datapath, priority, match, actions, buffer_id=None):
+        """Helper function to add a single flow entry."""
+        datapath.send_msg(self.flow_mod(datapath, priority, match, actions, buffer_id))
+
+    def _add_flows_batch(self, datapath, mods):
+        """
+        Sends mods back to back in one burst, then a single barrier so the
+        switch has applied all of them before it handles anything after.
+        """
+        for mod in mods:
+            datapath.send_msg(mod)
+        datapath.send_msg(datapath.ofproto_parser.OFPBarrierRequest(datapath))
+
+    def static_path_mods(self, datapath):
+        """Builds datapath's hard-coded FlowMods for CSE <--> ECE traffic via core switch c1."""
+        return [self.flow_mod(datapath, STATIC_PRIORITY, match, actions)
+                for match, actions in STATIC_RULES[datapath.id]]
+
+    def static_paths_installed(self, dpid):
+        """Logs dpid's static rules and, once every path switch has them, the whole path."""
+        self.logger.info("*** Static path rules installed on %016x.", dpid)
+        self.paths_pending.discard(dpid)
+        if not self.paths_pending:
+            self.logger.info("*** Static path rules installed: CSE <--> ECE via c1. ***")
+            self.logger.info("*** The path through c2 is now idle, ready for the AI agent. ***\n")
 
     @set_ev_cls(ofp_event.EventOFPPacketIn, MAIN_DISPATCHER)
     def _packet_in_handler(self, ev):
@@ -113,52 +137,44 @@ class StaticPathController(app_manager.RyuApp):
         """
         msg = ev.msg
         datapath = msg.datapath
-        ofproto = datapath.ofproto
-        parser = datapath.ofproto_parser
         in_port = msg.match['in_port']
         
-        pkt = packet.Packet(msg.data)
-        eth = pkt.get_protocol(ethernet.ethernet)
-
         # --- BUG FIX ---
         # Ignore packets that are not standard Ethernet frames.
         # This prevents crashes when receiving non-Ethernet protocols.
-        if not eth:
+        if len(msg.data) < ETH_HEADER.size:
             return
+        dst, src, ethertype = ETH_HEADER.unpack_from(msg.data)
 
-        if eth.ethertype == ether_types.ETH_TYPE_LLDP:
+        if ethertype == ether_types.ETH_TYPE_LLDP:
             # ignore lldp packet
             return
             
-        dst = eth.dst
-        src = eth.src
         dpid = datapath.id
 
-        self.mac_to_port[dpid][src] = in_port
-
-        if dst in self.mac_to_port[dpid]:
-            out_port = self.mac_to_port[dpid][dst]
-        else:
-            out_port = ofproto.OFPP_FLOOD
+        mac_table = self.mac_to_port[dpid]
+        mac_table.learn(src, in_port)
+        out_port = mac_table.get(dst, OFPP_FLOOD)
 
-        actions = [parser.OFPActionOutput(out_port)]
+        actions = self.output_actions[dpid][out_port]
 
         # install a flow to avoid packet_in next time
-        if out_port != ofproto.OFPP_FLOOD:
-            match = parser.OFPMatch(in_port=in_port, eth_dst=dst, eth_src=src)
+        if out_port != OFPP_FLOOD:
+            # MACs are learned as raw bytes; OF1.3's OFPMatch takes the text form
+            match = OFPMatch(in_port=in_port, eth_dst=dst.hex(':'), eth_src=src.hex(':'))
             # We don't want to install a flow for our statically routed traffic,
             # so we only install flows with a lower priority.
-            if msg.buffer_id != ofproto.OFP_NO_BUFFER:
+            if msg.buffer_id != OFP_NO_BUFFER:
                 self.add_flow(datapath, 1, match, actions, msg.buffer_id)
                 return
             else:
                 self.add_flow(datapath, 1, match, actions)
 
         data = None
-        if msg.buffer_id == ofproto.OFP_NO_BUFFER:
+        if msg.buffer_id == OFP_NO_BUFFER:
             data = msg.data
 
-        out = parser.OFPPacketOut(datapath=datapath, buffer_id=msg.buffer_id,
-                                  in_port=in_port, actions=actions, data=data)
+        out = OFPPacketOut(datapath=datapath, buffer_id=msg.buffer_id,
+                           in_port=in_port, actions=actions, data=data)
         datapath.send_msg(out)
 
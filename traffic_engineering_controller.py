@@ -180,8 +180,13 @@
 # 2. Provides the REST API for the DRL agent.
 # 3. Provides a REST API to serve a real-time web dashboard.
 
+import gzip
 import json
 import os
+import time
+from collections import defaultdict
+from operator import attrgetter
+import numpy as np
 from ryu.base import app_manager
 from ryu.controller import ofp_event
 from ryu.controller.handler import CONFIG_DISPATCHER, MAIN_DISPATCHER, DEAD_DISPATCHER
@@ -193,11 +198,42 @@ from ryu.lib import hub
 from ryu.app.wsgi import ControllerBase, WSGIApplication, route
 from webob import Response
 from webob.static import DirectoryApp # Needed for dashboard
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 CONTROLLER_INSTANCE_NAME = 'te_controller_app'
 # Path to your dashboard.html file
 # Assumes it's in the same directory as this controller
 DASHBOARD_DIR = os.path.dirname(os.path.abspath(__file__))
+# One /network_state_binary record per port: little-endian port_no (u32), tx_bytes (u64),
+# packed (12 bytes, no padding)
+PORT_TX_RECORD = np.dtype([('port_no', '<u4'), ('tx_bytes', '<u8')])
+# Columns of the per-switch port counter matrix (one row per port)
+PORT_COUNTER_FIELDS = ('port_no', 'rx_packets', 'tx_packets', 'rx_bytes', 'tx_bytes',
+                       'rx_dropped', 'tx_dropped', 'rx_errors', 'tx_errors')
+COL = {name: i for i, name in enumerate(PORT_COUNTER_FIELDS)}
+_port_counters = attrgetter(*PORT_COUNTER_FIELDS)
+STATS_INTERVAL = 1      # Seconds between port/flow stats requests to each switch
+# Differs on every controller start, so clients can tell a restarted stats_seq from a stale one
+BOOT_ID = f'{time.time_ns():x}'
+LONG_POLL_TIMEOUT = 10  # Max seconds a ?since= request waits for a newer sample
+FLOW_STATS_EVERY = 5    # Monitor ticks per flow stats request (port stats go every tick)
+BARRIER_TIMEOUT = 5     # Max seconds /reroute_flows waits for the switches' barrier replies
+
+
+def dumps_json(obj):
+    """UTF-8 JSON bytes for obj, encoded by orjson (C) when it's installed."""
+    if orjson is not None:
+        # dpid keys are ints; OPT_NON_STR_KEYS writes them as strings, like json does
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj).encode()
+
+
+def json_response(body):
+    """Response carrying already-encoded JSON bytes."""
+    return Response(body=body, content_type='application/json', charset='utf-8')
 
 
 class TrafficEngineeringController(app_manager.RyuApp):
@@ -209,8 +245,23 @@ class TrafficEngineeringController(app_manager.RyuApp):
         
         # --- Statistics Monitoring ---
         self.datapaths = {}
-        self.port_stats = {} # Stores port statistics
+        self.port_stats_dicts = {} # each switch's port stats as plain dicts, built once per reply for the JSON APIs
+        # Port stats as structure-of-arrays: per dpid, an (n_ports, len(PORT_COUNTER_FIELDS))
+        # uint64 matrix, so a counter across all ports is one column
+        self.port_counters = {}
+        # Counter deltas between a switch's last two replies (port_no column
+        # kept as is) and the seconds between them: {dpid: (delta, interval)}
+        self.port_deltas = {}
+        self.port_stats_time = {} # time.monotonic() of each switch's last reply
+        self.port_stats_json = None # Encoded /network_state body; None until rebuilt after a reply
+        self.port_stats_gzip = None # The same body gzipped, built on the first gzip-capable GET
+        self.port_stats_version = 0 # Bumped per reply; the /network_state ETag
         self.flow_stats = {} # Stores flow statistics
+        # Long-poll support: stats_seq[dpid] counts port stats replies, and
+        # stats_event is set (then replaced) whenever one arrives.
+        self.stats_seq = {}
+        self.stats_event = hub.Event()
+        self.barrier_waiters = {} # {barrier xid: hub.Event set when its reply arrives}
         self.monitor_thread = hub.spawn(self._monitor)
         
         # --- Dashboard Data ---
@@ -233,7 +284,6 @@ class TrafficEngineeringController(app_manager.RyuApp):
         dpid = datapath.id
 
         self.datapaths[dpid] = datapath
-        self.port_stats.setdefault(dpid, {})
         self.flow_stats.setdefault(dpid, {})
 
         match = parser.OFPMatch()
@@ -242,26 +292,57 @@ class TrafficEngineeringController(app_manager.RyuApp):
         self.add_flow(datapath, 0, match, actions) # Priority 0 (lowest)
         self.logger.info("Switch %d connected and table-miss rule installed.", dpid)
 
-    # Helper function to add flow entries
-    def add_flow(self, datapath, priority, match, actions, buffer_id=None, idle_timeout=0, hard_timeout=0):
+    # Helper function to build a flow entry's FlowMod without sending it
+    def flow_mod(self, datapath, priority, match, actions, buffer_id=None, idle_timeout=0, hard_timeout=0):
         ofproto = datapath.ofproto
         parser = datapath.ofproto_parser
 
         inst = [parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS,
                                              actions)]
         if buffer_id:
-            mod = parser.OFPFlowMod(datapath=datapath, buffer_id=buffer_id,
-                                    priority=priority, match=match,
-                                    idle_timeout=idle_timeout,
-                                    hard_timeout=hard_timeout,
-                                    instructions=inst)
-        else:
-            mod = parser.OFPFlowMod(datapath=datapath, priority=priority,
-                                    match=match,
-                                    idle_timeout=idle_timeout,
-                                    hard_timeout=hard_timeout,
-                                    instructions=inst)
-        datapath.send_msg(mod)
+            return parser.OFPFlowMod(datapath=datapath, buffer_id=buffer_id,
+                                     priority=priority, match=match,
+                                     idle_timeout=idle_timeout,
+                                     hard_timeout=hard_timeout,
+                                     instructions=inst)
+        return parser.OFPFlowMod(datapath=datapath, priority=priority,
+                                 match=match,
+                                 idle_timeout=idle_timeout,
+                                 hard_timeout=hard_timeout,
+                                 instructions=inst)
+
+    # Helper function to add flow entries
+    def add_flow(self, datapath, priority, match, actions, buffer_id=None, idle_timeout=0, hard_timeout=0):
+        datapath.send_msg(self.flow_mod(datapath, priority, match, actions, buffer_id,
+                                        idle_timeout, hard_timeout))
+
+    def send_flow_batch(self, datapath, mods):
+        """
+        Send mods back to back, then one barrier. Returns the barrier's xid,
+        for wait_barrier() to wait until the switch has processed them all.
+        """
+        for mod in mods:
+            datapath.send_msg(mod)
+        barrier = datapath.ofproto_parser.OFPBarrierRequest(datapath)
+        xid = datapath.set_xid(barrier)
+        self.barrier_waiters[xid] = hub.Event()
+        datapath.send_msg(barrier)
+        return xid
+
+    def wait_barrier(self, xid, timeout):
+        """Wait (cooperatively) for xid's barrier reply; False if it didn't come within timeout."""
+        done = self.barrier_waiters.get(xid)
+        if done is None:
+            return True # Already answered
+        replied = done.wait(timeout=timeout)
+        self.barrier_waiters.pop(xid, None) # Don't keep waiters for switches that never answer
+        return replied
+
+    @set_ev_cls(ofp_event.EventOFPBarrierReply, MAIN_DISPATCHER)
+    def _barrier_reply_handler(self, ev):
+        done = self.barrier_waiters.pop(ev.msg.xid, None)
+        if done is not None:
+            done.set()
 
 
     # -------------------------------------------------------------------
@@ -280,17 +361,27 @@ class TrafficEngineeringController(app_manager.RyuApp):
                 del self.datapaths[dpid]
 
     def _monitor(self):
-        """Monitoring thread to request stats from switches every 5 seconds."""
+        """Monitoring thread to request stats from switches every STATS_INTERVAL seconds."""
+        tick = 0
         while True:
-            for dp in self.datapaths.values():
-                self._request_stats(dp)
-            hub.sleep(5) # Request stats every 5 seconds
-
-    def _request_stats(self, datapath):
+            with_flows = tick % FLOW_STATS_EVERY == 0
+            # Queue every switch's requests in one burst, then yield once so
+            # the per-datapath send loops flush them together. The list()
+            # snapshot keeps a disconnect mid-burst from resizing the dict.
+            for dp in list(self.datapaths.values()):
+                self._queue_stats_requests(dp, with_flows)
+            tick += 1
+            hub.sleep(STATS_INTERVAL)
+
+    def _queue_stats_requests(self, datapath, with_flows=True):
+        """Queue a port stats (and optionally flow stats) request; send_msg only enqueues."""
         ofproto = datapath.ofproto
         parser = datapath.ofproto_parser
-        req = parser.OFPFlowStatsRequest(datapath)
-        datapath.send_msg(req)
+        if with_flows:
+            # Nothing reads flow_stats at the port stats cadence, so these go
+            # out only every FLOW_STATS_EVERY ticks
+            req = parser.OFPFlowStatsRequest(datapath)
+            datapath.send_msg(req)
         req = parser.OFPPortStatsRequest(datapath, 0, ofproto.OFPP_ANY)
         datapath.send_msg(req)
 
@@ -304,7 +395,41 @@ class TrafficEngineeringController(app_manager.RyuApp):
     def _port_stats_reply_handler(self, ev):
         body = ev.msg.body
         dpid = ev.msg.datapath.id
-        self.port_stats[dpid] = body
+        now = time.monotonic()
+        counters = np.array(list(map(_port_counters, body)),
+                            dtype=np.uint64).reshape(-1, len(PORT_COUNTER_FIELDS))
+        # Rows in port order, so consecutive replies line up row for row
+        counters = counters[np.argsort(counters[:, COL['port_no']], kind='stable')]
+        prev = self.port_counters.get(dpid)
+        if prev is not None and np.array_equal(prev[:, COL['port_no']], counters[:, COL['port_no']]):
+            # One vectorized subtract for every port x counter; a counter
+            # that went backwards (port reset) reads as 0, not a uint64 wrap
+            delta = np.where(counters >= prev, counters - prev, 0).astype(np.uint64)
+            delta[:, COL['port_no']] = counters[:, COL['port_no']]
+            self.port_deltas[dpid] = (delta, now - self.port_stats_time[dpid])
+        else:
+            # First reply, or the port set changed: no comparable previous sample
+            self.port_deltas.pop(dpid, None)
+        self.port_counters[dpid] = counters
+        self.port_stats_time[dpid] = now
+        # Convert here, once per poll, instead of on every GET
+        self.port_stats_dicts[dpid] = [stat._asdict() for stat in body]
+        self.port_stats_json = self.port_stats_gzip = None
+        self.port_stats_version += 1
+        self.stats_seq[dpid] = self.stats_seq.get(dpid, 0) + 1
+        # Wake every long-poll waiter; later waiters block on the fresh event
+        event, self.stats_event = self.stats_event, hub.Event()
+        event.set()
+
+    def wait_port_stats(self, dpid, since, timeout=LONG_POLL_TIMEOUT):
+        """Block (cooperatively) until dpid's stats_seq passes since or timeout expires; return the seq."""
+        deadline = time.monotonic() + timeout
+        while self.stats_seq.get(dpid, 0) <= since:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self.stats_event.wait(timeout=remaining)
+        return self.stats_seq.get(dpid, 0)
 
 # -------------------------------------------------------------------
 # --- 3. REST API Logic (For DRL Agent AND Dashboard) ---
@@ -327,32 +452,100 @@ class RestController(ControllerBase):
 
     @route('stats', '/network_state', methods=['GET'])
     def get_network_state(self, req, **kwargs):
-        """API for the DRL Agent to get port stats."""
-        return Response(json=self.controller_app.port_stats)
+        """
+        API for the DRL Agent to get port stats.
+
+        The ETag changes with every stats reply, so a client holding the
+        current version gets a bodyless 304. It is prefixed with BOOT_ID, as
+        the version count restarts with the controller and a cached body
+        from before the restart must not revalidate. Bodies are gzipped
+        (level 1) for clients that accept it (gzip;q=0 does not count); the
+        gzip body has its own ETag ('<boot>-<version>-gz') since it is a
+        different representation.
+        """
+        app = self.controller_app
+        # No Accept-Encoding header at all: send identity, not webob's "anything goes"
+        use_gzip = ('Accept-Encoding' in req.headers
+                    and req.accept_encoding.best_match(['gzip']) == 'gzip')
+        etag = f'{BOOT_ID}-{app.port_stats_version}'
+        if use_gzip:
+            etag += '-gz'
+        if etag in req.if_none_match:
+            response = Response(status=304)
+        else:
+            # Encoded (and compressed) at most once per stats reply; repeat GETs reuse the bytes
+            if app.port_stats_json is None:
+                app.port_stats_json = dumps_json(app.port_stats_dicts)
+            if use_gzip:
+                if app.port_stats_gzip is None:
+                    app.port_stats_gzip = gzip.compress(app.port_stats_json, compresslevel=1)
+                response = json_response(app.port_stats_gzip)
+                response.content_encoding = 'gzip'
+            else:
+                response = json_response(app.port_stats_json)
+        response.etag = etag
+        response.vary = 'Accept-Encoding'
+        return response
+
+    @route('stats', '/network_state_binary/{dpid}', methods=['GET'],
+           requirements={'dpid': r'[0-9]+'})
+    def get_network_state_binary(self, req, dpid, **kwargs):
+        """
+        Compact port stats for the DRL Agent: ports * 12 bytes of PORT_TX_RECORD
+        (port_no, tx_bytes) instead of the full JSON stats. Empty if the switch
+        hasn't replied to a port stats request yet.
+
+        With ?since=<seq> this is a long-poll: it waits until a sample newer
+        than seq arrives (or LONG_POLL_TIMEOUT). The sample's seq is returned
+        in the X-Stats-Seq header, to pass as the next request's since;
+        X-Stats-Boot (BOOT_ID) changes when the controller restarts and the
+        seq count starts over. X-Stats-Interval carries the measured seconds between the switch's
+        last two samples (STATS_INTERVAL until there are two).
+        """
+        dpid = int(dpid)
+        app = self.controller_app
+        try:
+            since = int(req.GET.get('since', -1))
+        except ValueError:
+            return Response(status=400, json={"error": "since must be an integer."})
+        seq = app.wait_port_stats(dpid, since)
+        counters = app.port_counters.get(dpid)
+        if counters is None:
+            body = b''
+        else:
+            # Two column copies into a packed record array, no per-port Python work
+            records = np.empty(len(counters), dtype=PORT_TX_RECORD)
+            records['port_no'] = counters[:, COL['port_no']]
+            records['tx_bytes'] = counters[:, COL['tx_bytes']]
+            body = records.tobytes()
+        response = Response(body=body, content_type='application/octet-stream')
+        response.headers['X-Stats-Seq'] = str(seq)
+        response.headers['X-Stats-Boot'] = BOOT_ID
+        deltas = app.port_deltas.get(dpid)
+        response.headers['X-Stats-Interval'] = repr(deltas[1] if deltas else float(STATS_INTERVAL))
+        return response
+
+    @route('stats', '/network_rates', methods=['GET'])
+    def get_network_rates(self, req, **kwargs):
+        """
+        Per-port counter deltas between each switch's last two stats replies:
+        {dpid: {'interval': seconds, 'ports': [{'port_no': .., 'tx_bytes': .., ...}]}}.
+        A switch is missing until it has two replies with the same ports.
+        """
+        rates = {dpid: {'interval': interval,
+                        'ports': [dict(zip(PORT_COUNTER_FIELDS, row)) for row in delta.tolist()]}
+                 for dpid, (delta, interval) in self.controller_app.port_deltas.items()}
+        return json_response(dumps_json(rates))
 
     @route('action', '/reroute_flow', methods=['POST'])
     def reroute_flow(self, req, **kwargs):
         """API for the DRL Agent to send flow rules."""
         try:
-            data = req.json
-            dpid = data.get('dpid')
-            priority = data.get('priority', 10)
-            match_fields = data.get('match', {})
-            action_fields = data.get('actions', [])
-
-            datapath = self.controller_app.datapaths.get(dpid)
+            datapath, mod = self._reroute_mod(req.json)
             if not datapath:
                 return Response(status=404, json={"error": "Datapath not found."})
 
-            parser = datapath.ofproto_parser
-            match = parser.OFPMatch(**match_fields)
-            
-            actions = []
-            for a in action_fields:
-                if a.get('type') == 'OUTPUT':
-                    actions.append(parser.OFPActionOutput(a.get('port')))
-            
-            self.controller_app.add_flow(datapath, priority, match, actions, hard_timeout=10)
+            datapath.send_msg(mod)
             
             return Response(json={'status': 'success', 'message': 'Flow rule added.'})
 
@@ -360,6 +553,70 @@ class RestController(ControllerBase):
             self.controller_app.logger.error("Error in /reroute_flow: %s", e)
             return Response(status=500, json={"error": str(e)})
 
+    @route('action', '/reroute_flows', methods=['POST'])
+    def reroute_flows(self, req, **kwargs):
+        """
+        API for the DRL Agent to send many flow rules at once: a JSON array of
+        /reroute_flow bodies. Each switch gets its FlowMods in one burst plus
+        a single barrier, and the reply is sent once the barriers are answered
+        (dpids still unanswered after BARRIER_TIMEOUT are listed as unconfirmed).
+        A body that isn't a JSON array of objects gets a 400.
+        """
+        try:
+            flows = req.json
+        except ValueError:
+            flows = None
+        if not isinstance(flows, list) or not all(isinstance(data, dict) for data in flows):
+            return Response(status=400, json={"error": "Body must be a JSON array of flow objects."})
+        try:
+            batches = defaultdict(list)
+            missing = set()
+            for data in flows:
+                datapath, mod = self._reroute_mod(data)
+                if datapath:
+                    batches[datapath].append(mod)
+                else:
+                    missing.add(data.get('dpid'))
+            if missing:
+                # Nothing is sent unless every target switch is connected
+                return Response(status=404, json={"error": "Datapath not found.",
+                                                  "dpids": sorted(missing, key=str)})
+
+            app = self.controller_app
+            pending = {dp.id: app.send_flow_batch(dp, mods) for dp, mods in batches.items()}
+            deadline = time.monotonic() + BARRIER_TIMEOUT
+            unconfirmed = [dpid for dpid, xid in pending.items()
+                           if not app.wait_barrier(xid, max(0, deadline - time.monotonic()))]
+
+            return Response(json={'status': 'success' if not unconfirmed else 'timeout',
+                                  'message': f'{sum(map(len, batches.values()))} flow rules added.',
+                                  'unconfirmed': unconfirmed})
+
+        except Exception as e:
+            self.controller_app.logger.error("Error in /reroute_flows: %s", e)
+            return Response(status=500, json={"error": str(e)})
+
+    def _reroute_mod(self, data):
+        """(datapath, OFPFlowMod) for one /reroute_flow body; (None, None) if its switch isn't connected."""
+        dpid = data.get('dpid')
+        priority = data.get('priority', 10)
+        match_fields = data.get('match', {})
+        action_fields = data.get('actions', [])
+
+        datapath = self.controller_app.datapaths.get(dpid)
+        if not datapath:
+            return None, None
+
+        parser = datapath.ofproto_parser
+        match = parser.OFPMatch(**match_fields)
+        
+        actions = []
+        for a in action_fields:
+            if a.get('type') == 'OUTPUT':
+                actions.append(parser.OFPActionOutput(a.get('port')))
+        
+        return datapath, self.controller_app.flow_mod(datapath, priority, match, actions, hard_timeout=10)
+
     # --- NEW API ENDPOINTS FOR THE DASHBOARD ---
 
     @route('qtable', '/update_q_table', methods=['POST'])
@@ -382,7 +639,7 @@ class RestController(ControllerBase):
         API for the DASHBOARD to GET all live data.
         """
         data = {
-            'port_stats': self.controller_app.port_stats,
+            'port_stats': self.controller_app.port_stats_dicts,
             'q_table': self.controller_app.q_table
         }
-        return Response(json=data)
\ No newline at end of file
+        return json_response(dumps_json(data))
\ No newline at end of file